@@ -49,10 +49,12 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'market.middleware.QueryStatsMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'market.middleware.CurrentProfileMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'debug_toolbar.middleware.DebugToolbarMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
@@ -130,6 +132,12 @@ LANGUAGES = [
 # https://docs.djangoproject.com/en/4.0/howto/static-files/
 
 STATIC_URL = 'static/'
+STATIC_ROOT = BASE_DIR / 'static_root'
+ASSETS_PRODUCTION = bool(os.environ.get('ASSETS_PRODUCTION', not DEBUG))
+if ASSETS_PRODUCTION:
+    STATICFILES_STORAGE = 'market.assets.CompressedManifestStaticFilesStorage'
+ASSETS_IMMUTABLE_MAX_AGE = 31536000
+ASSETS_MAX_AGE = 3600
 LOGIN_REDIRECT_URL = '/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media/')
 MEDIA_URL = '/media/'
@@ -158,4 +166,42 @@ DEFAULT_FROM_EMAIL = 'marketplace@marketplace.com'
 SERVER_MAIL = 'admin@marketplace.com'
 
 CSRF_COOKIE_SECURE = True
-SESSION_COOKIE_SECURE = True
\ No newline at end of file
+SESSION_COOKIE_SECURE = True
+PAYMENT_WORKERS = int(os.environ.get('PAYMENT_WORKERS', 4))
+PAYMENT_TIMEOUT = 60
+HEADER_CACHE_TIMEOUT = 300
+SEARCH_FTS = True
+CATALOGUE_PAGE_SIZE = 20
+CATALOGUE_CACHE_TIMEOUT = 600
+MODERATOR_PAGE_SIZE = 50
+GUEST_CART_CACHE_TIMEOUT = 3600
+BEST_SELLERS_COUNT = 10
+BEST_SELLERS_CACHE_TIMEOUT = 3600
+IMAGE_DERIVATIVES = {
+    'item_image': {'thumb': (100, 100), 'preview': (200, 200)},
+    'avatar': {'avatar': (200, 200)},
+}
+IMAGE_WEBP_QUALITY = 80
+IMAGE_JPEG_QUALITY = 85
+QUERY_STATS = bool(os.environ.get('QUERY_STATS', DEBUG))
+QUERY_STATS_SAMPLES = 1000
+QUERY_STATS_FLUSH_EVERY = 500
+QUERY_STATS_FILE = os.environ.get('QUERY_STATS_FILE', BASE_DIR / 'querystats.jsonl')
+QUERY_STATS_FILE_MAX_BYTES = 10 * 1024 * 1024
+BENCHMARK_BASELINE = BASE_DIR / 'benchmarks' / 'baseline.json'
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'market.querystats': {
+            'handlers': ['console'],
+            'level': 'INFO',
+        },
+    },
+}
@@ -0,0 +1,199 @@
+import gzip
+import mimetypes
+import os
+import re
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import (FileResponse, Http404, HttpResponse,
+                         StreamingHttpResponse)
+from django.urls import re_path
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+from market.images import DERIVED_DIR
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+MANIFEST_NAME = re.compile(r'\.[0-9a-f]{12}\.\w+$')
+DERIVED_NAME = re.compile(rf'(^|/){DERIVED_DIR}/.+\.[0-9a-f]{{16}}\.\w+$')
+COMPRESSIBLE = ('.css', '.js', '.map', '.json', '.svg', '.html', '.txt', '.xml', '.ico', '.ttf', '.otf', '.eot')
+PRECOMPRESSED = (('br', '.br'), ('gzip', '.gz'))
+RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+CHUNK_SIZE = 64 * 1024
+
+
+def compress_file(path, min_size=256):
+    """
+    Writes gzip and, with the brotli package installed, brotli variants next
+    to a text file. A variant is kept only if it is noticeably smaller
+    """
+    if not path.endswith(COMPRESSIBLE) or os.path.getsize(path) < min_size:
+        return []
+    with open(path, 'rb') as file:
+        data = file.read()
+    variants = [('.gz', gzip.compress(data, compresslevel=9, mtime=0))]
+    if brotli is not None:
+        variants.append(('.br', brotli.compress(data)))
+    written = []
+    for suffix, compressed in variants:
+        if len(compressed) < len(data) * 0.95:
+            with open(path + suffix, 'wb') as file:
+                file.write(compressed)
+            written.append(path + suffix)
+    return written
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+
+    """Manifest storage that also precompresses the collected files"""
+
+    def post_process(self, paths, dry_run=False, **options):
+        hashed_names = set()
+        for name, hashed_name, processed in super().post_process(paths, dry_run, **options):
+            if hashed_name and not isinstance(processed, Exception):
+                hashed_names.add(hashed_name)
+            yield name, hashed_name, processed
+        if not dry_run:
+            for name in {*paths, *hashed_names}:
+                compress_file(self.path(name))
+
+
+def _accepted_encodings(header):
+    """Content codings of an Accept-Encoding header with their q-values"""
+    accepted = {}
+    for item in header.split(','):
+        coding, *params = [part.strip() for part in item.split(';')]
+        if not coding:
+            continue
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        accepted[coding.lower()] = quality
+    return accepted
+
+
+def _variant(request, path):
+    """
+    Precompressed variant of the file with the highest q-value accepted by
+    the client, the file itself otherwise. Codings with q=0 are refused
+    """
+    accepted = _accepted_encodings(request.headers.get('Accept-Encoding', ''))
+    best = path, None
+    best_quality = 0
+    if 'Range' not in request.headers:
+        for encoding, suffix in PRECOMPRESSED:
+            quality = accepted.get(encoding, accepted.get('*', 0))
+            if quality > best_quality and os.path.isfile(path + suffix):
+                best, best_quality = (path + suffix, encoding), quality
+    return best
+
+
+def _byte_range(request, etag, size):
+    """Requested (start, end) of the file, None for the whole file, False if unsatisfiable"""
+    match = RANGE.match(request.headers.get('Range', ''))
+    if not match or request.headers.get('If-Range', etag) != etag:
+        return None
+    start, end = match.groups()
+    if not start:
+        if not end:
+            return None
+        start, end = max(size - int(end), 0), size - 1
+    else:
+        start, end = int(start), min(int(end), size - 1) if end else size - 1
+    if start > end or start >= size:
+        return False
+    return start, end
+
+
+def _read_range(path, start, length):
+    with open(path, 'rb') as file:
+        file.seek(start)
+        while length > 0:
+            chunk = file.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+def _file_response(request, path, encoding, etag, size, content_type):
+    byte_range = _byte_range(request, etag, size)
+    if byte_range is False:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+    elif byte_range is not None:
+        start, end = byte_range
+        response = StreamingHttpResponse(_read_range(path, start, end - start + 1),
+                                         status=206, content_type=content_type)
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        response['Content-Length'] = end - start + 1
+    else:
+        response = FileResponse(open(path, 'rb'))
+        response['Content-Type'] = content_type
+        del response['Content-Disposition']
+        if encoding:
+            response['Content-Encoding'] = encoding
+    return response
+
+
+def serve(request, path, root, immutable):
+    """
+    Serves a file of the directory named by the root setting with validators,
+    byte ranges and precompressed variants. Files whose names match the
+    immutable pattern contain the hash of their content and are cached for good
+    """
+    try:
+        fullpath = safe_join(getattr(settings, root), path)
+    except SuspiciousFileOperation:
+        raise Http404
+    if not os.path.isfile(fullpath):
+        raise Http404
+    served, encoding = _variant(request, fullpath)
+    stat = os.stat(served)
+    etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+    if immutable.search(path):
+        cache_control = f'public, max-age={settings.ASSETS_IMMUTABLE_MAX_AGE}, immutable'
+    else:
+        cache_control = f'public, max-age={settings.ASSETS_MAX_AGE}'
+    headers = {'ETag': etag, 'Last-Modified': http_date(stat.st_mtime),
+               'Cache-Control': cache_control, 'Accept-Ranges': 'bytes'}
+    if any(os.path.isfile(fullpath + suffix) for _, suffix in PRECOMPRESSED):
+        headers['Vary'] = 'Accept-Encoding'
+    content_type = mimetypes.guess_type(fullpath)[0] or 'application/octet-stream'
+    response = get_conditional_response(request, etag=etag, last_modified=int(stat.st_mtime))
+    if response is None:
+        response = _file_response(request, served, encoding, etag, stat.st_size, content_type)
+    for header, value in headers.items():
+        response[header] = value
+    return response
+
+
+serve.sessionless = True
+
+
+def _pattern(prefix, root, immutable):
+    return re_path(rf'^{re.escape(prefix.lstrip("/"))}(?P<path>.*)$', serve,
+                   kwargs={'root': root, 'immutable': immutable})
+
+
+def asset_patterns():
+    """
+    Media files are always served by the application. Collected static files
+    are served too in the production asset mode, in development they are left
+    to the staticfiles app
+    """
+    patterns = [_pattern(settings.MEDIA_URL, 'MEDIA_ROOT', DERIVED_NAME)]
+    if settings.ASSETS_PRODUCTION:
+        patterns.append(_pattern(settings.STATIC_URL, 'STATIC_ROOT', MANIFEST_NAME))
+    return patterns
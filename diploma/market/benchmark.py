@@ -0,0 +1,134 @@
+import json
+import statistics
+import time
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from market.models import (Item, Item_category, Item_in_unauthorized_cart,
+                           Order, Profile)
+
+# Scenario name: (who requests it, URL builder taking the benchmark objects)
+SCENARIOS = {
+    'main': ('guest', lambda objects: reverse('main')),
+    'catalogue': ('guest', lambda objects: reverse('catalogue') + f'?category_query={objects["category"]}'),
+    'catalogue_by_price': ('guest', lambda objects: reverse('catalogue') +
+                           f'?category_query={objects["category"]}&sort=price&min_price=100&max_price=3000'),
+    'catalogue_search': ('guest', lambda objects: reverse('catalogue') +
+                         f'?category_query={objects["category"]}&item_query=smart'),
+    'product': ('guest', lambda objects: reverse('product', args=[objects['item']])),
+    'product_reviews': ('guest', lambda objects: reverse('product_reviews', args=[objects['item']])),
+    'guest_cart': ('guest', lambda objects: reverse('cart')),
+    'guest_order': ('guest', lambda objects: reverse('order')),
+    'cart': ('user', lambda objects: reverse('cart')),
+    'order': ('user', lambda objects: reverse('order')),
+    'account': ('user', lambda objects: reverse('account', args=[objects['user']])),
+    'history': ('user', lambda objects: reverse('history', args=[objects['profile'], objects['order']])),
+    'moderator_users': ('admin', lambda objects: reverse('moderator_users')),
+    'moderator_orders': ('admin', lambda objects: reverse('moderator_orders')),
+    'moderator_products': ('admin', lambda objects: reverse('moderator_products')),
+}
+
+
+def benchmark_objects():
+    """Picks the heaviest rows of the current database for the scenarios"""
+    profile = Profile.objects.filter(admin=False, cart__item_in_cart__isnull=False, order__isnull=False) \
+                             .select_related('user').first()
+    admin = Profile.objects.filter(admin=True).select_related('user').first()
+    item = Item.objects.filter(status=True).order_by('-number_of_reviews', 'id').first()
+    category = Item_category.objects.filter(status=True) \
+                                    .annotate(items=Count('item')) \
+                                    .order_by('-items', 'id').first()
+    guest_session = Item_in_unauthorized_cart.objects.values_list('session_key', flat=True).first()
+    if not (profile and admin and item and category):
+        raise ValueError('Not enough data, run generate_data first')
+    return {
+        'user': profile.user.id,
+        'profile': profile.id,
+        'user_obj': profile.user,
+        'admin_obj': admin.user,
+        'order': Order.objects.filter(profile=profile).values_list('id', flat=True).first(),
+        'item': item.id,
+        'category': category.name,
+        'guest_session': guest_session,
+    }
+
+
+def _client(objects, who):
+    host = next((host.lstrip('.') for host in settings.ALLOWED_HOSTS if host != '*'), 'localhost')
+    # An address outside INTERNAL_IPS keeps the debug toolbar out of the measurements
+    client = Client(HTTP_HOST=host, REMOTE_ADDR='10.0.0.1')
+    if who == 'user':
+        client.force_login(objects['user_obj'])
+    elif who == 'admin':
+        client.force_login(objects['admin_obj'])
+    elif objects['guest_session']:
+        session = client.session
+        session['session_key'] = int(objects['guest_session'])
+        session.save()
+    return client
+
+
+def run(repeat=5, warmup=1, scenarios=None):
+    """Latency percentiles and the number of queries of every scenario"""
+    objects = benchmark_objects()
+    results = {}
+    for name in scenarios or SCENARIOS:
+        who, url = SCENARIOS[name]
+        client = _client(objects, who)
+        url = url(objects)
+        for _ in range(warmup):
+            client.get(url)
+        timings = []
+        for _ in range(repeat):
+            connection.queries_log.clear()
+            with CaptureQueriesContext(connection) as queries:
+                start = time.perf_counter()
+                response = client.get(url)
+                timings.append((time.perf_counter() - start) * 1000)
+        timings.sort()
+        results[name] = {
+            'status': response.status_code,
+            'queries': len(queries.captured_queries),
+            'median_ms': round(statistics.median(timings), 2),
+            'max_ms': round(timings[-1], 2),
+        }
+    return results
+
+
+def compare(results, baseline):
+    """
+    Scenarios that make more queries than the baseline or answer with another
+    status. Timings depend on the machine, so only the query counts are compared
+    """
+    regressions = []
+    for name, result in results.items():
+        expected = baseline.get(name)
+        if expected is None:
+            continue
+        if result['queries'] > expected['queries']:
+            regressions.append(f'{name}: {result["queries"]} queries, baseline {expected["queries"]}')
+        if result['status'] != expected['status']:
+            regressions.append(f'{name}: status {result["status"]}, baseline {expected["status"]}')
+    return regressions
+
+
+def load_baseline(path):
+    try:
+        with open(path) as baseline_file:
+            return json.load(baseline_file)
+    except FileNotFoundError:
+        return {}
+
+
+def save_baseline(path, results):
+    """Stores the query counts and statuses, timings are left out"""
+    budgets = {name: {'queries': result['queries'], 'status': result['status']}
+               for name, result in results.items()}
+    with open(path, 'w') as baseline_file:
+        json.dump(budgets, baseline_file, indent=2, sort_keys=True)
+        baseline_file.write('\n')
@@ -0,0 +1,91 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from market.models import Item_category, Profile
+
+CATEGORIES_CACHE_KEY = 'market:header:categories'
+PRICES_VERSION_KEY = 'market:prices:version'
+PROFILE_SESSION_KEY = 'profile_ids'
+
+
+def get_active_categories():
+    """
+    Returns the names of active categories sorted by name, their ids and
+    the name of the default category. The result is kept in the cache until a category
+    is changed
+    """
+    categories = cache.get(CATEGORIES_CACHE_KEY)
+    if categories is None:
+        active = list(Item_category.objects.filter(status=True).values_list('id', 'name'))
+        categories = {
+            'names': sorted(name for _, name in active),
+            'ids': {name: category_id for category_id, name in active},
+            'default': min(active)[1] if active else None,
+        }
+        cache.set(CATEGORIES_CACHE_KEY, categories,
+                  getattr(settings, 'HEADER_CACHE_TIMEOUT', 300))
+    return categories
+
+
+def invalidate_categories(**kwargs):
+    cache.delete(CATEGORIES_CACHE_KEY)
+
+
+def get_request_profile(request):
+    """
+    Profile of the current user together with the user and the cart, loaded
+    with one query the first time a request needs it
+    """
+    if not hasattr(request, '_cached_profile'):
+        profile = None
+        if request.user.is_authenticated:
+            profile = Profile.objects.select_related('user', 'cart') \
+                                     .filter(user=request.user).first()
+        request._cached_profile = profile
+    return request._cached_profile
+
+
+def get_session_profile_ids(request):
+    """Ids of the profile and of the cart of the current user, stored in the session"""
+    user = request.user
+    if not user.is_authenticated:
+        return None, None
+    stored = request.session.get(PROFILE_SESSION_KEY)
+    if stored and stored[0] == user.id:
+        return stored[1], stored[2]
+    if hasattr(request, '_cached_profile'):
+        profile = request._cached_profile
+        cart = getattr(profile, 'cart', None)
+        ids = (profile.id if profile else None, cart.id if cart else None)
+    else:
+        ids = Profile.objects.filter(user=user).values_list('id', 'cart__id').first() or (None, None)
+    request.session[PROFILE_SESSION_KEY] = [user.id, *ids]
+    return tuple(ids)
+
+
+def get_session_profile_id(request):
+    """Id of the profile of the current user, stored in the session"""
+    return get_session_profile_ids(request)[0]
+
+
+def get_session_cart_id(request):
+    return get_session_profile_ids(request)[1]
+
+
+def get_prices_version():
+    return cache.get_or_set(PRICES_VERSION_KEY, time.time_ns(), None)
+
+
+def invalidate_prices(**kwargs):
+    """Makes every cached value depending on item prices stale"""
+    cache.set(PRICES_VERSION_KEY, time.time_ns(), None)
+
+
+def guest_cart_total_key(session_key):
+    return f'market:guest_cart:{get_prices_version()}:{session_key}'
+
+
+def invalidate_guest_cart_total(session_key):
+    cache.delete(guest_cart_total_key(session_key))
@@ -0,0 +1,184 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import F, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce, Greatest
+
+from market.cache import (get_session_cart_id, guest_cart_total_key,
+                          invalidate_guest_cart_total)
+from market.helpers import check_or_set_user_cookie_data
+from market.models import Cart, Item, Item_in_cart, Item_in_unauthorized_cart
+
+UPSERT_VENDORS = ('sqlite', 'postgresql')
+
+
+def guest_cart_total(session_key):
+    """
+    Price of the items in the cart of a guest, computed with one aggregate
+    and cached until the cart or the prices change
+    """
+    key = guest_cart_total_key(session_key)
+    total = cache.get(key)
+    if total is None:
+        total = Item_in_unauthorized_cart.objects.filter(session_key=session_key) \
+                                                 .aggregate(total=Coalesce(Sum(F('quantity') * F('item__price')), 0))['total']
+        cache.set(key, total, getattr(settings, 'GUEST_CART_CACHE_TIMEOUT', 3600))
+    return total
+
+
+def get_cart_owner(request):
+    """Keyword arguments selecting the cart of the current user or guest"""
+    if request.user.is_authenticated:
+        return {'cart_id': get_session_cart_id(request)}
+    return {'session_key': check_or_set_user_cookie_data(request)}
+
+
+def _lines(cart_id=None, session_key=None):
+    if cart_id is not None:
+        return Item_in_cart, {'cart_id': cart_id}
+    return Item_in_unauthorized_cart, {'session_key': str(session_key)}
+
+
+def _upsert_line(model, owner, item_id, quantity):
+    """Inserts a cart line or increases the quantity of the existing one"""
+    if connection.vendor in UPSERT_VENDORS:
+        qn = connection.ops.quote_name
+        table = qn(model._meta.db_table)
+        owner_column = qn(model._meta.get_field(next(iter(owner))).column)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {table} ({owner_column}, item_id, quantity) VALUES (%s, %s, %s) '
+                f'ON CONFLICT ({owner_column}, item_id) '
+                f'DO UPDATE SET quantity = {table}.quantity + excluded.quantity',
+                [next(iter(owner.values())), item_id, quantity]
+            )
+        return
+    updated = model.objects.filter(item_id=item_id, **owner).update(quantity=F('quantity') + quantity)
+    if not updated:
+        line, created = model.objects.get_or_create(item_id=item_id, defaults={'quantity': quantity}, **owner)
+        if not created:
+            model.objects.filter(id=line.id).update(quantity=F('quantity') + quantity)
+
+
+def _cart_changed(cart_id, session_key):
+    if cart_id is None:
+        invalidate_guest_cart_total(session_key)
+
+
+def apply_total_delta(cart_id, amount):
+    """
+    Moves the stored total of the cart by amount in one UPDATE. The amount
+    may be an expression, so the prices are never read into Python
+    """
+    if cart_id is not None:
+        Cart.objects.filter(id=cart_id) \
+                    .update(cart_price=Greatest(F('cart_price') + Coalesce(amount, 0), 0))
+
+
+def cart_totals():
+    """Actual totals of carts computed from their lines, for use as a subquery"""
+    return Coalesce(Subquery(Item_in_cart.objects.filter(cart=OuterRef('pk'))
+                                                 .values('cart')
+                                                 .annotate(total=Sum(F('quantity') * F('item__price')))
+                                                 .values('total')), 0)
+
+
+def recalculate_cart(cart_id):
+    Cart.objects.filter(id=cart_id).update(cart_price=cart_totals())
+
+
+def inconsistent_carts():
+    """Carts whose stored total differs from the sum of their lines"""
+    return Cart.objects.annotate(actual=cart_totals()).exclude(cart_price=F('actual'))
+
+
+def reconcile_carts():
+    """Recomputes the totals of all drifted carts with one statement, returns their number"""
+    return Cart.objects.filter(id__in=inconsistent_carts().values('id')) \
+                       .update(cart_price=cart_totals())
+
+
+def add_item(item_id, quantity=1, cart_id=None, session_key=None):
+    """Adds the quantity of the item to the cart of a user or of a guest"""
+    if quantity <= 0:
+        return
+    model, owner = _lines(cart_id, session_key)
+    with transaction.atomic(savepoint=False):
+        _upsert_line(model, owner, item_id, quantity)
+        apply_total_delta(cart_id, Subquery(Item.objects.filter(id=item_id).values('price')[:1]) * quantity)
+    _cart_changed(cart_id, session_key)
+
+
+def remove_line(line_id, cart_id=None, session_key=None):
+    model, owner = _lines(cart_id, session_key)
+    line_price = model.objects.filter(id=line_id, **owner) \
+                              .values(total=F('quantity') * F('item__price'))
+    with transaction.atomic(savepoint=False):
+        apply_total_delta(cart_id, -Subquery(line_price[:1]))
+        model.objects.filter(id=line_id, **owner).delete()
+    _cart_changed(cart_id, session_key)
+
+
+def set_quantity(line_id, quantity, cart_id=None, session_key=None):
+    """Sets the quantity of a cart line, the line is removed if it drops to zero"""
+    if quantity <= 0:
+        return remove_line(line_id, cart_id, session_key)
+    model, owner = _lines(cart_id, session_key)
+    difference = model.objects.filter(id=line_id, **owner) \
+                              .values(total=(quantity - F('quantity')) * F('item__price'))
+    with transaction.atomic(savepoint=False):
+        apply_total_delta(cart_id, Subquery(difference[:1]))
+        model.objects.filter(id=line_id, **owner).update(quantity=quantity)
+    _cart_changed(cart_id, session_key)
+
+
+def change_quantity(line_id, delta, cart_id=None, session_key=None):
+    """
+    Adds delta to the quantity of a cart line, the line is removed if it
+    drops to zero. The line is changed first and the total is moved after,
+    so a change that keeps the line takes two statements
+    """
+    model, owner = _lines(cart_id, session_key)
+    lines = model.objects.filter(id=line_id, **owner)
+    with transaction.atomic(savepoint=False):
+        changed = lines.filter(quantity__gt=-delta).update(quantity=F('quantity') + delta)
+        if changed:
+            apply_total_delta(cart_id, Subquery(lines.values(total=F('item__price') * delta)[:1]))
+        elif delta < 0 and lines.delete()[0] and cart_id is not None:
+            recalculate_cart(cart_id)
+    _cart_changed(cart_id, session_key)
+
+
+def merge_guest_cart(session_key, cart_id):
+    """
+    Moves the cart of a guest into the cart of a user. Quantities of items
+    present in both carts are summed up, the guest lines are deleted and the
+    total is recomputed, with a fixed number of queries
+    """
+    guest_lines = Item_in_unauthorized_cart.objects.filter(session_key=str(session_key))
+    with transaction.atomic(savepoint=False):
+        quantities = dict(guest_lines.values_list('item_id', 'quantity'))
+        if not quantities:
+            return
+        existing = list(Item_in_cart.objects.filter(cart_id=cart_id, item_id__in=quantities))
+        for line in existing:
+            line.quantity += quantities.pop(line.item_id)
+        Item_in_cart.objects.bulk_update(existing, ['quantity'])
+        Item_in_cart.objects.bulk_create([
+            Item_in_cart(cart_id=cart_id, item_id=item_id, quantity=quantity)
+            for item_id, quantity in quantities.items()
+        ])
+        guest_lines.delete()
+        recalculate_cart(cart_id)
+    invalidate_guest_cart_total(session_key)
+
+
+def clear_cart(cart_id=None, session_key=None):
+    """Deletes all lines of a cart with one DELETE and resets its total with one UPDATE"""
+    model, owner = _lines(cart_id, session_key)
+    with transaction.atomic(savepoint=False):
+        model.objects.filter(**owner).delete()
+        if cart_id is not None:
+            Cart.objects.filter(id=cart_id).update(cart_price=0)
+    _cart_changed(cart_id, session_key)
+
@@ -0,0 +1,115 @@
+import hashlib
+import json
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from market.models import Item
+from market.pagination import keyset_page
+from market.search import search_items
+
+SORT_OPTIONS = {
+    'name': ('name', 'id'),
+    'price': ('price', 'id'),
+    'relevance': ('search_rank', 'id'),
+}
+MAX_PRICE = 999999999
+
+
+def _price(value, default):
+    try:
+        return max(int(value), 0)
+    except (TypeError, ValueError):
+        return default
+
+
+def normalize_filters(params):
+    """
+    Filters of a catalogue page with the defaults applied, so that requests
+    showing the same page get the same cache key
+    """
+    sort_type = params.get('sort')
+    return {
+        'min_price': _price(params.get('min_price'), 0),
+        'max_price': _price(params.get('max_price'), MAX_PRICE),
+        'reviews': bool(params.get('reviews_check')),
+        'query': ' '.join((params.get('item_query') or '').split()),
+        'sort': sort_type if sort_type in SORT_OPTIONS else None,
+        'after': params.get('after') or None,
+    }
+
+
+def filter_params(filters):
+    """Query parameters of the normalized filters, defaults are left out"""
+    params = {
+        'min_price': filters['min_price'] or None,
+        'max_price': filters['max_price'] if filters['max_price'] != MAX_PRICE else None,
+        'reviews_check': 'on' if filters['reviews'] else None,
+        'item_query': filters['query'] or None,
+        'sort': filters['sort'],
+        'after': filters['after'],
+    }
+    return {name: value for name, value in params.items() if value is not None}
+
+
+def catalogue_items(category_id, filters):
+    """Returns one page of the active items of the category, the next cursor, the sort type and whether it is ranked"""
+    items = Item.objects.filter(category_id=category_id,
+                                status=True,
+                                price__lte=filters['max_price'],
+                                price__gte=filters['min_price'])
+    if filters['reviews']:
+        items = items.filter(has_reviews=True)
+    items = search_items(items, filters['query'])
+    ranked = 'search_rank' in items.query.annotations
+    sort_type = filters['sort']
+    if sort_type is None or (sort_type == 'relevance' and not ranked):
+        sort_type = 'relevance' if ranked else 'name'
+    items, next_cursor = keyset_page(items,
+                                     SORT_OPTIONS[sort_type],
+                                     filters['after'],
+                                     settings.CATALOGUE_PAGE_SIZE)
+    return items, next_cursor, sort_type, ranked
+
+
+def _version_key(category_id):
+    return f'market:catalogue:version:{category_id}'
+
+
+def get_catalogue_version(category_id):
+    return cache.get_or_set(_version_key(category_id), time.time_ns(), None)
+
+
+def catalogue_page_key(category_id, filters, language):
+    digest = hashlib.md5(json.dumps(filters, sort_keys=True).encode()).hexdigest()
+    return f'market:catalogue:{category_id}:{get_catalogue_version(category_id)}:{language}:{digest}'
+
+
+def invalidate_catalogue(*category_ids):
+    """Makes the cached pages of the categories stale, pages of other categories are kept"""
+    for category_id in set(category_ids):
+        if category_id is not None:
+            cache.set(_version_key(category_id), time.time_ns(), None)
+
+
+def item_changed(sender, instance, **kwargs):
+    invalidate_catalogue(instance.category_id, getattr(instance, '_saved_category_id', None))
+
+
+def invalidate_item_catalogue(*item_ids):
+    """Makes the cached pages of the categories of the items stale"""
+    invalidate_catalogue(*Item.objects.filter(id__in=item_ids).values_list('category_id', flat=True))
+
+
+def item_image_changed(sender, instance, **kwargs):
+    invalidate_item_catalogue(instance.item_id)
+
+
+def review_changed(sender, instance, **kwargs):
+    """Reviews change the counters shown in the catalogue and the reviews filter"""
+    invalidate_item_catalogue(instance.item_id)
+
+
+def category_changed(sender, instance, **kwargs):
+    invalidate_catalogue(instance.id)
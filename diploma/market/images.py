@@ -0,0 +1,165 @@
+import hashlib
+import io
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db.models import Min
+from PIL import Image, ImageOps
+
+from market.catalogue import invalidate_item_catalogue
+from market.models import Item_image, Profile
+
+DERIVED_FIELDS = {
+    Item_image: ('image', 'derivatives', 'item_image'),
+    Profile: ('avatar', 'avatar_derivatives', 'avatar'),
+}
+DERIVED_DIR = 'derived'
+
+
+def attach_primary_images(items):
+    """
+    Fetches the first image of every item of a page with one query and
+    stores it in the primary_image attribute of the item
+    """
+    items = list(items)
+    if not items:
+        return items
+    first_images = Item_image.objects.filter(item__in=[item.id for item in items]) \
+                                     .values('item') \
+                                     .annotate(first_id=Min('id')) \
+                                     .values('first_id')
+    images = {image.item_id: image for image in Item_image.objects.filter(id__in=first_images)}
+    for item in items:
+        item.primary_image = images.get(item.id)
+    return items
+
+
+def derivative_sizes(kind):
+    return getattr(settings, 'IMAGE_DERIVATIVES', {}).get(kind, {})
+
+
+def _encode(image, image_format):
+    buffer = io.BytesIO()
+    if image_format == 'webp':
+        image.save(buffer, 'WEBP', quality=getattr(settings, 'IMAGE_WEBP_QUALITY', 80), method=6)
+    elif image_format == 'png':
+        image.save(buffer, 'PNG', optimize=True)
+    else:
+        image.save(buffer, 'JPEG', quality=getattr(settings, 'IMAGE_JPEG_QUALITY', 85),
+                   optimize=True, progressive=True)
+    return buffer.getvalue()
+
+
+def _store(source_name, label, extension, data):
+    """Saves the file under a name containing the hash of its content, equal files are stored once"""
+    directory, filename = os.path.split(source_name)
+    stem = os.path.splitext(filename)[0]
+    digest = hashlib.sha256(data).hexdigest()[:16]
+    name = f'{directory}/{DERIVED_DIR}/{stem}_{label}.{digest}.{extension}'
+    if default_storage.exists(name):
+        return name
+    return default_storage.save(name, ContentFile(data))
+
+
+def render_derivatives(name, sizes):
+    """
+    Crops the stored image to every size and saves each one in WebP and in
+    JPEG, or PNG for images with transparency. Returns the names of the files
+    by size and format, an empty dict if the file is not a readable image
+    """
+    try:
+        with default_storage.open(name) as source:
+            image = ImageOps.exif_transpose(Image.open(source))
+            transparent = image.mode in ('RGBA', 'LA') or 'transparency' in image.info
+            image = image.convert('RGBA' if transparent else 'RGB')
+    except (OSError, ValueError, Image.DecompressionBombError):
+        return {}
+    fallback = 'png' if transparent else 'jpeg'
+    derivatives = {}
+    for label, size in sizes.items():
+        thumbnail = ImageOps.fit(image, tuple(size), Image.Resampling.LANCZOS)
+        derivatives[label] = {
+            'webp': _store(name, label, 'webp', _encode(thumbnail, 'webp')),
+            'fallback': _store(name, label, fallback, _encode(thumbnail, fallback)),
+        }
+    return derivatives
+
+
+def derivative_names(derivatives):
+    return {name for formats in derivatives.values() for name in formats.values()}
+
+
+def delete_replaced(old, new):
+    """Removes the files of the old derivatives that the new ones do not reuse"""
+    for name in derivative_names(old or {}) - derivative_names(new):
+        default_storage.delete(name)
+
+
+def update_derivatives(instance):
+    """
+    Renders the derivatives of an item image or of an avatar, stores their
+    names and removes the files rendered from the previous source
+    """
+    field, derivatives_field, kind = DERIVED_FIELDS[type(instance)]
+    source = getattr(instance, field)
+    derivatives = render_derivatives(source.name, derivative_sizes(kind)) if source else {}
+    old = getattr(instance, derivatives_field)
+    setattr(instance, derivatives_field, derivatives)
+    type(instance).objects.filter(id=instance.id).update(**{derivatives_field: derivatives})
+    delete_replaced(old, derivatives)
+    if isinstance(instance, Item_image):
+        invalidate_item_catalogue(instance.item_id)
+    return derivatives
+
+
+def pending_derivatives(model, force=False):
+    """Ids, file names and current derivatives of the images whose derivatives were not rendered yet"""
+    field, derivatives_field, kind = DERIVED_FIELDS[model]
+    rows = model.objects.exclude(**{f'{field}__isnull': True}).exclude(**{field: ''})
+    if not force:
+        rows = rows.filter(**{derivatives_field: {}})
+    return rows.order_by('id').values_list('id', field, derivatives_field)
+
+
+def _setup_worker():
+    django.setup()
+
+
+def _render(task):
+    row_id, name, sizes = task
+    return row_id, render_derivatives(name, sizes)
+
+
+def backfill_derivatives(workers=None, force=False, batch_size=100):
+    """
+    Renders the missing derivatives of all item images and avatars in a pool
+    of processes. Workers only read and write files, the names are stored by
+    this process with one bulk update per batch. Kinds of images without
+    configured sizes are skipped. Returns the numbers of rendered and of
+    unreadable images
+    """
+    rendered = failed = 0
+    with ProcessPoolExecutor(max_workers=workers, initializer=_setup_worker) as pool:
+        for model, (field, derivatives_field, kind) in DERIVED_FIELDS.items():
+            sizes = derivative_sizes(kind)
+            if not sizes:
+                continue
+            rows = list(pending_derivatives(model, force))
+            for start in range(0, len(rows), batch_size):
+                batch = rows[start:start + batch_size]
+                tasks = [(row_id, name, sizes) for row_id, name, old in batch]
+                results = [model(id=row_id, **{derivatives_field: derivatives})
+                           for row_id, derivatives in pool.map(_render, tasks)]
+                model.objects.bulk_update(results, [derivatives_field])
+                for (row_id, name, old), result in zip(batch, results):
+                    delete_replaced(old, getattr(result, derivatives_field))
+                if model is Item_image:
+                    images = model.objects.filter(id__in=[result.id for result in results])
+                    invalidate_item_catalogue(*images.values_list('item_id', flat=True))
+                failed += sum(1 for result in results if not getattr(result, derivatives_field))
+                rendered += len(results)
+    return rendered - failed, failed
@@ -0,0 +1,46 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from market import benchmark
+
+
+class Command(BaseCommand):
+    help = 'Measures latency and query count of the main pages and compares them with a baseline'
+
+    def add_arguments(self, parser):
+        parser.add_argument('scenarios', nargs='*', metavar='scenario',
+                            help=f'Scenarios to run, all by default: {", ".join(benchmark.SCENARIOS)}')
+        parser.add_argument('--repeat', type=int, default=5,
+                            help='Measured requests per scenario')
+        parser.add_argument('--baseline', default=getattr(settings, 'BENCHMARK_BASELINE', None),
+                            help='JSON file with the baseline, BENCHMARK_BASELINE by default')
+        parser.add_argument('--save-baseline', action='store_true',
+                            help='Store the query counts as the new baseline')
+
+    def handle(self, *args, **options):
+        scenarios = options['scenarios'] or list(benchmark.SCENARIOS)
+        unknown = [name for name in scenarios if name not in benchmark.SCENARIOS]
+        if unknown:
+            raise CommandError(f'Unknown scenarios: {", ".join(unknown)}')
+        try:
+            results = benchmark.run(repeat=options['repeat'], scenarios=scenarios)
+        except ValueError as error:
+            raise CommandError(error)
+        baseline = benchmark.load_baseline(options['baseline']) if options['baseline'] else {}
+        self.stdout.write(f'{"scenario":<20} {"status":>6} {"queries":>8} {"median ms":>10} '
+                          f'{"max ms":>8} {"baseline":>18}')
+        for name, result in results.items():
+            expected = baseline.get(name)
+            reference = f'{expected["queries"]} q' if expected else '-'
+            self.stdout.write(f'{name:<20} {result["status"]:>6} {result["queries"]:>8} '
+                              f'{result["median_ms"]:>10} {result["max_ms"]:>8} {reference:>18}')
+        if options['save_baseline']:
+            if not options['baseline']:
+                raise CommandError('No baseline file given')
+            benchmark.save_baseline(options['baseline'], dict(baseline, **results))
+            self.stdout.write(self.style.SUCCESS(f'Baseline saved to {options["baseline"]}'))
+            return
+        regressions = benchmark.compare(results, baseline)
+        if regressions:
+            raise CommandError('Regressions found:\n' + '\n'.join(regressions))
+        self.stdout.write(self.style.SUCCESS('No regressions against the baseline'))
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from market.images import backfill_derivatives
+
+
+class Command(BaseCommand):
+    help = 'Renders thumbnails and WebP variants of item images and avatars uploaded before'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=None,
+                            help='Number of worker processes (default is the number of CPUs)')
+        parser.add_argument('--batch-size', type=int, default=100,
+                            help='Images stored per bulk update')
+        parser.add_argument('--force', action='store_true',
+                            help='Render again the images that already have derivatives')
+
+    def handle(self, *args, **options):
+        rendered, failed = backfill_derivatives(workers=options['workers'],
+                                                force=options['force'],
+                                                batch_size=options['batch_size'])
+        if failed:
+            self.stdout.write(self.style.WARNING(f'{failed} files are missing or are not images'))
+        self.stdout.write(self.style.SUCCESS(f'Derivatives of {rendered} images rendered'))
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+
+from market.synthetic import DEFAULTS, PASSWORD, generate
+
+VOLUMES = {
+    'users': 'users, each with a profile and a cart',
+    'categories': 'categories',
+    'items': 'items',
+    'images': 'images per item',
+    'reviews': 'reviews',
+    'cart_lines': 'lines per cart',
+    'guest_carts': 'carts of guests',
+    'orders': 'orders of users and guests',
+    'order_lines': 'lines per order',
+}
+
+
+class Command(BaseCommand):
+    help = 'Bulk-creates synthetic users, catalogue, reviews, carts and orders'
+
+    def add_arguments(self, parser):
+        for volume, description in VOLUMES.items():
+            parser.add_argument(f'--{volume.replace("_", "-")}', type=int, default=DEFAULTS[volume],
+                                help=f'Number of {description} (default {DEFAULTS[volume]})')
+        parser.add_argument('--seed', type=int, default=0,
+                            help='Seed of the random generator, the same seed gives the same data')
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Rows per INSERT statement')
+
+    def handle(self, *args, **options):
+        volumes = {volume: options[volume] for volume in DEFAULTS}
+        created = generate(seed=options['seed'], batch_size=options['batch_size'], **volumes)
+        for kind, number in created.items():
+            self.stdout.write(f'{kind}: {number}')
+        self.stdout.write(self.style.SUCCESS(f'Synthetic data created, user password is {PASSWORD}'))
@@ -0,0 +1,20 @@
+import datetime
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from market.orders import purge_drafts
+
+
+class Command(BaseCommand):
+    help = 'Deletes unpaid draft orders abandoned for the given number of days'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=7,
+                            help='Age of a draft since its last update, in days')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        older_than = timezone.now() - datetime.timedelta(days=options['days'])
+        purged = purge_drafts(older_than, options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'{purged} draft orders deleted'))
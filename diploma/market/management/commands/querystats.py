@@ -0,0 +1,32 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from market.querystats import (METRICS, PERCENTILES, read_samples,
+                               remove_samples, summarize)
+
+
+class Command(BaseCommand):
+    help = 'Reports per-view query counts, SQL and template time and response size'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--file', default=getattr(settings, 'QUERY_STATS_FILE', None),
+                            help='File with the flushed samples, QUERY_STATS_FILE by default')
+        parser.add_argument('--reset', action='store_true',
+                            help='Remove the collected samples after the report')
+
+    def handle(self, *args, **options):
+        path = options['file']
+        if not path:
+            raise CommandError('QUERY_STATS_FILE is not set')
+        report = summarize(read_samples(path))
+        if not report:
+            self.stdout.write('No samples collected yet')
+            return
+        columns = [f'{metric}_p{rank}' for metric in METRICS for rank in PERCENTILES]
+        width = max(len(view) for view in report)
+        self.stdout.write(f'{"view":<{width}}  {"requests":>8}  ' + '  '.join(f'{c:>14}' for c in columns))
+        for view, row in report.items():
+            self.stdout.write(f'{view:<{width}}  {row["requests"]:>8}  ' +
+                              '  '.join(f'{row[c]:>14}' for c in columns))
+        if options['reset']:
+            remove_samples(path)
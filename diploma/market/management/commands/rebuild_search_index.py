@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from market import search
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the full-text search index of items'
+
+    def handle(self, *args, **options):
+        if not search.fts_enabled(connection):
+            raise CommandError('Full-text index is available only on SQLite with FTS5')
+        search.ensure_index(connection)
+        indexed = search.rebuild_index(connection)
+        self.stdout.write(self.style.SUCCESS(f'{indexed} items indexed'))
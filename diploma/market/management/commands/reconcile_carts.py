@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from market.carts import inconsistent_carts, reconcile_carts
+
+
+class Command(BaseCommand):
+    help = 'Recomputes stored cart totals from the cart lines'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true',
+                            help='Only report carts with a wrong total, fail if there are any')
+
+    def handle(self, *args, **options):
+        if options['check']:
+            drifted = inconsistent_carts().count()
+            if drifted:
+                raise CommandError(f'{drifted} carts have a wrong total')
+            self.stdout.write(self.style.SUCCESS('All cart totals are consistent'))
+            return
+        fixed = reconcile_carts()
+        self.stdout.write(self.style.SUCCESS(f'{fixed} cart totals fixed'))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from market.reviews import recount_reviews
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the number of reviews of every item'
+
+    def handle(self, *args, **options):
+        updated = recount_reviews()
+        self.stdout.write(self.style.SUCCESS(f'Review counters of {updated} items rebuilt'))
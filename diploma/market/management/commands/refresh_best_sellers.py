@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from market.sales import recount_times_bought, refresh_all_rankings
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the best seller rankings of all categories'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recount', action='store_true',
+                            help='Recompute purchase counters from paid orders first')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            if options['recount']:
+                counted = recount_times_bought()
+                self.stdout.write(f'Purchase counters of {counted} items recomputed')
+            ranked = refresh_all_rankings()
+        self.stdout.write(self.style.SUCCESS(f'{ranked} best sellers ranked'))
@@ -0,0 +1,79 @@
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+from django.utils.functional import SimpleLazyObject
+
+from market import querystats
+from market.cache import get_request_profile, get_session_profile_ids
+
+
+class QueryStatsMiddleware:
+
+    """
+    Measures the number of SQL queries, their total time, the template
+    rendering time and the response size of every request, and collects
+    them per view. The samples are flushed every QUERY_STATS_FLUSH_EVERY
+    requests. Enabled by QUERY_STATS, which follows DEBUG by default
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        querystats.instrument_templates()
+
+    def __call__(self, request):
+        if not getattr(settings, 'QUERY_STATS', False):
+            return self.get_response(request)
+        sample = querystats.start_sample()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(self.measure_query))
+                response = self.get_response(request)
+        finally:
+            querystats.finish_sample()
+        if not response.streaming:
+            sample['bytes'] = len(response.content)
+        match = request.resolver_match
+        view = match.view_name if match else 'unresolved'
+        if querystats.stats.record(view, sample) >= getattr(settings, 'QUERY_STATS_FLUSH_EVERY', 500):
+            querystats.stats.flush()
+        return response
+
+    @staticmethod
+    def measure_query(execute, sql, params, many, context):
+        sample = querystats.current_sample()
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            if sample is not None:
+                sample['queries'] += 1
+                sample['sql_ms'] += (time.perf_counter() - start) * 1000
+
+
+class CurrentProfileMiddleware:
+
+    """
+    Sets request.profile and request.cart of the authenticated user. Both
+    are loaded lazily with one query and only by requests that use them.
+    The ids kept in the session tell whether they exist, so guests and users
+    without a profile or a cart get a plain None. Views marked as sessionless
+    do not touch the session, so their responses do not vary on the cookie
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        return self.get_response(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.profile = request.cart = None
+        if not getattr(view_func, 'sessionless', False) and request.user.is_authenticated:
+            profile_id, cart_id = get_session_profile_ids(request)
+            if profile_id is not None:
+                request.profile = SimpleLazyObject(lambda: get_request_profile(request))
+            if cart_id is not None:
+                request.cart = SimpleLazyObject(lambda: get_request_profile(request).cart)
@@ -0,0 +1,23 @@
+# Generated by Django 4.0.6 on 2026-10-18 20:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('market', '0031_order_error_alter_item_date_created_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='payment_pending',
+            field=models.BooleanField(default=False, verbose_name='payment in progress'),
+        ),
+        migrations.AddField(
+            model_name='unauthorised_order',
+            name='payment_pending',
+            field=models.BooleanField(default=False, verbose_name='payment in progress'),
+        ),
+    ]
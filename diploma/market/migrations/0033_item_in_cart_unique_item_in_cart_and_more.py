@@ -0,0 +1,36 @@
+# Generated by Django 4.0.6 on 2026-10-18 20:48
+
+from django.db import migrations, models
+from django.db.models import Count, Min, Sum
+
+
+def merge_duplicate_lines(apps, schema_editor):
+    """Sums up the quantities of repeated cart lines into the first one"""
+    for model_name, owner in (('Item_in_cart', 'cart'), ('Item_in_unauthorized_cart', 'session_key')):
+        model = apps.get_model('market', model_name)
+        duplicates = model.objects.values(owner, 'item') \
+                                  .annotate(lines=Count('id'), first=Min('id'), total=Sum('quantity')) \
+                                  .filter(lines__gt=1)
+        for duplicate in duplicates:
+            lines = model.objects.filter(**{owner: duplicate[owner]}, item=duplicate['item'])
+            lines.exclude(id=duplicate['first']).delete()
+            lines.update(quantity=duplicate['total'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('market', '0032_order_payment_pending_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_lines, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='item_in_cart',
+            constraint=models.UniqueConstraint(fields=('cart', 'item'), name='unique_item_in_cart'),
+        ),
+        migrations.AddConstraint(
+            model_name='item_in_unauthorized_cart',
+            constraint=models.UniqueConstraint(fields=('session_key', 'item'), name='unique_item_in_unauthorized_cart'),
+        ),
+    ]
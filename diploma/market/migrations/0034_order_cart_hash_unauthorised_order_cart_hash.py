@@ -0,0 +1,23 @@
+# Generated by Django 4.0.6 on 2026-10-18 21:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('market', '0033_item_in_cart_unique_item_in_cart_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='cart_hash',
+            field=models.CharField(blank=True, default=None, max_length=40, null=True, verbose_name='cart hash'),
+        ),
+        migrations.AddField(
+            model_name='unauthorised_order',
+            name='cart_hash',
+            field=models.CharField(blank=True, default=None, max_length=40, null=True, verbose_name='cart hash'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.0.6 on 2026-10-18 21:40
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('market', '0034_order_cart_hash_unauthorised_order_cart_hash'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Best_seller',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rank', models.PositiveIntegerField(verbose_name='rank')),
+                ('times_bought', models.PositiveIntegerField(default=0, verbose_name='purchase times')),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='market.item_category')),
+                ('item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='market.item')),
+            ],
+            options={
+                'verbose_name': 'best seller',
+                'verbose_name_plural': 'best sellers',
+                'ordering': ['category', 'rank'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='best_seller',
+            constraint=models.UniqueConstraint(fields=('category', 'rank'), name='unique_best_seller_rank'),
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 4.0.6 on 2026-10-18 22:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('market', '0035_best_seller'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='best_seller',
+            index=models.Index(fields=['-times_bought', 'item'], name='best_seller_top_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='item',
+            index=models.Index(condition=models.Q(('status', True)), fields=['category', 'name', 'id'], name='item_catalogue_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='item',
+            index=models.Index(condition=models.Q(('status', True)), fields=['category', 'price', 'id'], name='item_catalogue_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='item',
+            index=models.Index(condition=models.Q(('has_reviews', True), ('status', True)), fields=['category', 'price', 'id'], name='item_catalogue_reviewed_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='item',
+            index=models.Index(condition=models.Q(('status', True)), fields=['category', '-times_bought', 'id'], name='item_best_sellers_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='item',
+            index=models.Index(condition=models.Q(('limited', True)), fields=['id'], name='item_limited_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='item_category',
+            index=models.Index(fields=['name'], name='item_category_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='item_category',
+            index=models.Index(condition=models.Q(('status', True)), fields=['name'], name='item_category_active_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['profile', 'date_of_order'], name='order_profile_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='unauthorised_order',
+            index=models.Index(fields=['session_key', 'id'], name='unauth_order_session_idx'),
+        ),
+    ]
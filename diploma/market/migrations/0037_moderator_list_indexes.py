@@ -0,0 +1,37 @@
+# Generated by Django 4.0.6 on 2026-10-18 23:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('market', '0036_catalogue_and_session_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='item',
+            index=models.Index(condition=models.Q(('status', True)), fields=['name', 'id'], name='item_active_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='item',
+            index=models.Index(condition=models.Q(('status', True)), fields=['price', 'id'], name='item_active_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['date_of_order', 'id'], name='order_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['price', 'id'], name='order_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='unauthorised_order',
+            index=models.Index(fields=['date_of_order', 'id'], name='unauth_order_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='unauthorised_order',
+            index=models.Index(fields=['price', 'id'], name='unauth_order_price_idx'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.0.6 on 2026-10-18 20:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('market', '0037_moderator_list_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='item_image',
+            name='derivatives',
+            field=models.JSONField(blank=True, default=dict, verbose_name='pic derivatives'),
+        ),
+        migrations.AddField(
+            model_name='profile',
+            name='avatar_derivatives',
+            field=models.JSONField(blank=True, default=dict, verbose_name='userPic derivatives'),
+        ),
+    ]
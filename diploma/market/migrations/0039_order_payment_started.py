@@ -0,0 +1,23 @@
+# Generated by Django 4.0.6 on 2026-10-19 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('market', '0038_image_derivatives'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='payment_started',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='payment started'),
+        ),
+        migrations.AddField(
+            model_name='unauthorised_order',
+            name='payment_started',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='payment started'),
+        ),
+    ]
@@ -1,9 +1,11 @@
 import datetime
 
-from django.contrib.auth.models import Group, User
+from django.contrib.auth.models import User
 from django.db import models
 from django.utils.translation import gettext_lazy as _
 
+from market.roles import set_admin_group
+
 # Create your models here.
 
 class Profile(models.Model):
@@ -28,6 +30,9 @@ class Profile(models.Model):
                                blank=True,
                                null=True,
                                verbose_name=_('userPic'))
+    avatar_derivatives = models.JSONField(default=dict,
+                                          blank=True,
+                                          verbose_name=_('userPic derivatives'))
     status = models.BooleanField(choices=ACTIVITY_STATUS,
                                  default=True,
                                  verbose_name=_('activity status'))
@@ -38,14 +43,18 @@ class Profile(models.Model):
     def __str__(self):
         return self.user.username
 
-    def save(self, *args, **kwargs):
-        if self.admin:
-            gr = Group.objects.get(name='Admins')
-        else:
-            gr = Group.objects.get(name='Users')
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        profile = super().from_db(db, field_names, values)
+        profile._saved_admin = profile.__dict__.get('admin')
+        return profile
 
-        gr.user_set.add(self.user)
+    def save(self, *args, **kwargs):
+        flipped = getattr(self, '_saved_admin', None) != self.admin
         super().save(*args, **kwargs)
+        if flipped:
+            set_admin_group(self.user_id, self.admin)
+            self._saved_admin = self.admin
 
     class Meta:
         verbose_name = _('profile')
@@ -82,6 +91,14 @@ class Item_category(models.Model):
     def __str__(self):
         return self.name
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['name'], name='item_category_name_idx'),
+            models.Index(fields=['name'],
+                         condition=models.Q(status=True),
+                         name='item_category_active_idx'),
+        ]
+
 
 class Item(models.Model):
 
@@ -123,9 +140,67 @@ class Item(models.Model):
                                   default=False,
                                   verbose_name=_('limited offer'))
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['category', 'name', 'id'],
+                         condition=models.Q(status=True),
+                         name='item_catalogue_name_idx'),
+            models.Index(fields=['category', 'price', 'id'],
+                         condition=models.Q(status=True),
+                         name='item_catalogue_price_idx'),
+            models.Index(fields=['category', 'price', 'id'],
+                         condition=models.Q(status=True, has_reviews=True),
+                         name='item_catalogue_reviewed_idx'),
+            models.Index(fields=['category', '-times_bought', 'id'],
+                         condition=models.Q(status=True),
+                         name='item_best_sellers_idx'),
+            models.Index(fields=['id'],
+                         condition=models.Q(limited=True),
+                         name='item_limited_idx'),
+            models.Index(fields=['name', 'id'],
+                         condition=models.Q(status=True),
+                         name='item_active_name_idx'),
+            models.Index(fields=['price', 'id'],
+                         condition=models.Q(status=True),
+                         name='item_active_price_idx'),
+        ]
+
     def __str__(self):
         return self.name
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        item = super().from_db(db, field_names, values)
+        item._saved_category_id = item.__dict__.get('category_id')
+        return item
+
+
+
+class Best_seller(models.Model):
+    """Top selling items of a category, refreshed when orders are paid"""
+    category = models.ForeignKey(Item_category,
+                                 on_delete=models.CASCADE)
+    item = models.ForeignKey(Item,
+                             on_delete=models.CASCADE)
+    rank = models.PositiveIntegerField(verbose_name=_('rank'))
+    times_bought = models.PositiveIntegerField(default=0,
+                                               verbose_name=_('purchase times'))
+
+    class Meta:
+        verbose_name = _('best seller')
+        verbose_name_plural = _('best sellers')
+        ordering = ['category', 'rank']
+        constraints = [
+            models.UniqueConstraint(fields=['category', 'rank'],
+                                    name='unique_best_seller_rank'),
+        ]
+        indexes = [
+            models.Index(fields=['-times_bought', 'item'], name='best_seller_top_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.rank}. {self.item_id} in {self.category_id}'
+
 
 
 class Item_image(models.Model):
@@ -133,6 +208,9 @@ class Item_image(models.Model):
     image = models.ImageField(upload_to='item_images/',
                               default=None,
                               verbose_name=_('pic'))
+    derivatives = models.JSONField(default=dict,
+                                   blank=True,
+                                   verbose_name=_('pic derivatives'))
 
     def __str__(self):
         return f'{self.item} image'
@@ -147,14 +225,18 @@ class Item_in_cart(models.Model):
     class Meta:
         verbose_name = _('item_in_cart')
         verbose_name_plural = _('items_in_cart')
+        constraints = [
+            models.UniqueConstraint(fields=['cart', 'item'],
+                                    name='unique_item_in_cart'),
+        ]
 
     def __str__(self):
         return f'{self.item} in {self.cart}'
 
     def delete(self, *args, **kwargs):
-        cart = Cart.objects.get(id=self.cart.id)
-        cart.cart_price -= self.item.price
-        cart.save()
+        from market.carts import apply_total_delta
+        line_price = Item.objects.filter(id=self.item_id).values('price')[:1]
+        apply_total_delta(self.cart_id, -models.Subquery(line_price) * self.quantity)
         super().delete(*args, **kwargs)
 
 
@@ -165,6 +247,12 @@ class Item_in_unauthorized_cart(models.Model):
     quantity = models.PositiveIntegerField(default=1,
                                            verbose_name=_('number of items in cart'))
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['session_key', 'item'],
+                                    name='unique_item_in_unauthorized_cart'),
+        ]
+
     def __str__(self):
         return f'{self.item} of {self.session_key}'
 
@@ -196,6 +284,12 @@ class Order(models.Model):
     payment_status = models.BooleanField(default=False,
                                          null=False,
                                          verbose_name=_('payment_status'))
+    payment_pending = models.BooleanField(default=False,
+                                          null=False,
+                                          verbose_name=_('payment in progress'))
+    payment_started = models.DateTimeField(null=True,
+                                           blank=True,
+                                           verbose_name=_('payment started'))
     status = models.BooleanField(choices=ACTIVITY_STATUS,
                                  default=True,
                                  null=False,
@@ -218,9 +312,21 @@ class Order(models.Model):
     error = models.TextField(null=True,
                              default=None,
                              verbose_name=_('error'))
+    cart_hash = models.CharField(max_length=40,
+                                 null=True,
+                                 blank=True,
+                                 default=None,
+                                 verbose_name=_('cart hash'))
     def __str__(self):
         return f'Order id {self.id}'
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['profile', 'date_of_order'], name='order_profile_date_idx'),
+            models.Index(fields=['date_of_order', 'id'], name='order_date_idx'),
+            models.Index(fields=['price', 'id'], name='order_price_idx'),
+        ]
+
 class Item_in_order(models.Model):
     item = models.ForeignKey(Item, on_delete=models.CASCADE)
     order = models.ForeignKey(Order, on_delete=models.CASCADE)
@@ -262,6 +368,12 @@ class Unauthorised_order(models.Model):
     payment_status = models.BooleanField(default=False,
                                          null=False,
                                          verbose_name=_('payment_status'))
+    payment_pending = models.BooleanField(default=False,
+                                          null=False,
+                                          verbose_name=_('payment in progress'))
+    payment_started = models.DateTimeField(null=True,
+                                           blank=True,
+                                           verbose_name=_('payment started'))
     status = models.BooleanField(choices=ACTIVITY_STATUS,
                                  default=True, null=False,
                                  verbose_name=_('status'))
@@ -286,9 +398,21 @@ class Unauthorised_order(models.Model):
     error = models.TextField(null=True,
                              default=None,
                              verbose_name=_('error'))
+    cart_hash = models.CharField(max_length=40,
+                                 null=True,
+                                 blank=True,
+                                 default=None,
+                                 verbose_name=_('cart hash'))
     def __str__(self):
         return f'Unauth_Order id {self.id}'
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['session_key', 'id'], name='unauth_order_session_idx'),
+            models.Index(fields=['date_of_order', 'id'], name='unauth_order_date_idx'),
+            models.Index(fields=['price', 'id'], name='unauth_order_price_idx'),
+        ]
+
 class Item_in_unauthorised_order(models.Model):
     item = models.ForeignKey(Item,
                              on_delete=models.CASCADE)
@@ -316,20 +440,20 @@ class Review(models.Model):
                                on_delete=models.CASCADE,
                                default=None, verbose_name=_('author'))
     def save(self, *args, **kwargs):
-        if not self.item.has_reviews:
-            self.item.has_reviews = True
-            self.item.save()
-        self.item.number_of_reviews += 1
-        self.item.save()
+        created = self._state.adding
         super().save(*args, **kwargs)
-
+        if created:
+            Item.objects.filter(id=self.item_id) \
+                        .update(number_of_reviews=models.F('number_of_reviews') + 1,
+                                has_reviews=True)
 
     def delete(self, *args, **kwargs):
-        self.item.number_of_reviews -= 1
-        if self.item.number_of_reviews == 0:
-            self.item.has_reviews = False
-        self.item.save()
-        super().delete(*args, **kwargs)
+        result = super().delete(*args, **kwargs)
+        Item.objects.filter(id=self.item_id, number_of_reviews__gt=0) \
+                    .update(number_of_reviews=models.F('number_of_reviews') - 1,
+                            has_reviews=models.Case(models.When(number_of_reviews__gt=1, then=True),
+                                                    default=False))
+        return result
 
     class Meta:
         verbose_name = _('review')
@@ -0,0 +1,131 @@
+import hashlib
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from market.carts import merge_guest_cart
+from market.models import (Item_in_cart, Item_in_order,
+                           Item_in_unauthorised_order,
+                           Item_in_unauthorized_cart, Order,
+                           Unauthorised_order)
+
+ORDER_FIELDS = ('date_of_order', 'payment_method', 'payment_status', 'status',
+                'delivery_method', 'price', 'tel', 'city', 'adress', 'error',
+                'cart_hash')
+
+
+def _snapshot_cart(profile=None, session_key=None):
+    if profile is not None:
+        lines = Item_in_cart.objects.filter(cart__profile=profile)
+    else:
+        lines = Item_in_unauthorized_cart.objects.filter(session_key=session_key)
+    return list(lines.select_related('item'))
+
+
+def cart_hash(cart_lines):
+    """Version of the cart contents, changes with any item, quantity or price"""
+    data = ','.join(f'{line.item_id}:{line.quantity}:{line.item.price}'
+                    for line in sorted(cart_lines, key=lambda line: line.item_id))
+    return hashlib.sha1(data.encode()).hexdigest()
+
+
+def drafts(order_model):
+    """Orders built from a cart that are neither paid nor being paid"""
+    return order_model.objects.filter(payment_status=False,
+                                      payment_pending=False,
+                                      cart_hash__isnull=False)
+
+
+def build_order(profile=None, session_key=None):
+    """
+    Creates an order from the cart of a user or of a guest, or reuses the
+    open draft of the same owner. A draft built from the same cart contents
+    is returned as is, otherwise its lines are replaced. The cart is read
+    once, all order lines are written with one bulk insert and the order is
+    saved once with its total. Returns the order and its lines, or None and
+    an empty list when the cart is empty
+    """
+    with transaction.atomic():
+        cart_lines = _snapshot_cart(profile, session_key)
+        if not cart_lines:
+            return None, []
+        if profile is not None:
+            order_model, line_model = Order, Item_in_order
+            owner = {'profile': profile}
+        else:
+            order_model, line_model = Unauthorised_order, Item_in_unauthorised_order
+            owner = {'session_key': session_key}
+        version = cart_hash(cart_lines)
+        order = drafts(order_model).select_for_update().filter(**owner).order_by('-id').first()
+        if order is not None and order.cart_hash == version:
+            return order, list(line_model.objects.filter(order=order).select_related('item'))
+        if order is None:
+            order = order_model(tel=profile.tel if profile is not None else '0', **owner)
+        else:
+            line_model.objects.filter(order=order).delete()
+        order.cart_hash = version
+        order.date_of_order = timezone.now()
+        order.price = sum(line.quantity * line.item.price for line in cart_lines)
+        order.save()
+        order_lines = line_model.objects.bulk_create([
+            line_model(item=line.item,
+                       order=order,
+                       quantity=line.quantity,
+                       price_of_item=line.item.price)
+            for line in cart_lines
+        ])
+    return order, order_lines
+
+
+def purge_drafts(older_than, batch_size=1000):
+    """Deletes drafts not touched since older_than in batches, returns their number"""
+    purged = 0
+    for order_model in (Order, Unauthorised_order):
+        stale = drafts(order_model).filter(date_of_order__lt=older_than)
+        while True:
+            ids = list(stale.values_list('id', flat=True)[:batch_size])
+            if not ids:
+                break
+            with transaction.atomic():
+                order_model.objects.filter(id__in=ids).delete()
+            purged += len(ids)
+    return purged
+
+
+def merge_guest_orders(session_key, profile):
+    """
+    Turns the orders of a guest into orders of a user with one bulk insert of
+    orders and one of their lines, then deletes the guest orders. Orders that
+    are being paid are left to the payment worker
+    """
+    guest_orders = list(Unauthorised_order.objects.filter(session_key=str(session_key),
+                                                          payment_pending=False))
+    if not guest_orders:
+        return []
+    with transaction.atomic(savepoint=False):
+        orders = [Order(profile=profile, **{field: getattr(order, field) for field in ORDER_FIELDS})
+                  for order in guest_orders]
+        if connection.features.can_return_rows_from_bulk_insert:
+            Order.objects.bulk_create(orders)
+        else:
+            for order in orders:
+                order.save()
+        new_orders = {guest_order.id: order for guest_order, order in zip(guest_orders, orders)}
+        guest_lines = Item_in_unauthorised_order.objects.filter(order_id__in=new_orders)
+        Item_in_order.objects.bulk_create([
+            Item_in_order(item_id=line.item_id,
+                          order=new_orders[line.order_id],
+                          quantity=line.quantity,
+                          price_of_item=line.price_of_item)
+            for line in guest_lines
+        ])
+        Unauthorised_order.objects.filter(id__in=new_orders).delete()
+    return orders
+
+
+def merge_guest_data(session_key, cart, profile):
+    """Moves the cart and the orders of a guest to a newly registered user"""
+    with transaction.atomic():
+        merge_guest_cart(session_key, cart.id)
+        merge_guest_orders(session_key, profile)
+
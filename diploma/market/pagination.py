@@ -0,0 +1,108 @@
+import base64
+import datetime
+import json
+
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+
+MAX_INTEGER = 2 ** 63 - 1
+
+
+class CursorEncoder(DjangoJSONEncoder):
+
+    """Keeps microseconds of datetimes, so that cursors match stored values exactly"""
+
+    def default(self, o):
+        if isinstance(o, datetime.datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+def encode_cursor(values):
+    data = json.dumps(values, cls=CursorEncoder).encode()
+    return base64.urlsafe_b64encode(data).decode()
+
+
+def decode_cursor(cursor):
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (ValueError, TypeError):
+        return None
+    return values if isinstance(values, list) else None
+
+
+def _field_value(obj, field):
+    for part in field.lstrip('-').split('__'):
+        obj = getattr(obj, part)
+    return obj
+
+
+def fits_integer(number):
+    """Whether the database can bind the number as a signed 64-bit integer"""
+    return -MAX_INTEGER - 1 <= number <= MAX_INTEGER
+
+
+def _ordering_field(queryset, field):
+    """Model field or annotation that a field of the ordering refers to"""
+    name = field.lstrip('-')
+    if name in queryset.query.annotations:
+        return queryset.query.annotations[name].output_field
+    model = queryset.model
+    *relations, name = name.split('__')
+    for relation in relations:
+        model = model._meta.get_field(relation).related_model
+    return model._meta.get_field(name)
+
+
+def cursor_values(queryset, ordering, values):
+    """
+    Values of a decoded cursor converted to the types of the ordering fields,
+    None if a value is not a scalar or does not fit its field
+    """
+    if len(values) != len(ordering):
+        return None
+    converted = []
+    for field, value in zip(ordering, values):
+        if not isinstance(value, (str, int, float)):
+            return None
+        try:
+            value = _ordering_field(queryset, field).to_python(value)
+        except (ValueError, TypeError, ValidationError):
+            return None
+        if value is None or (isinstance(value, int) and not fits_integer(value)):
+            return None
+        converted.append(value)
+    return converted
+
+
+def keyset_filter(ordering, values):
+    """Condition selecting rows that come after the given values in the ordering"""
+    condition = Q()
+    for position, field in enumerate(ordering):
+        lookup = 'lt' if field.startswith('-') else 'gt'
+        step = Q(**{f'{field.lstrip("-")}__{lookup}': values[position]})
+        for previous, value in zip(ordering[:position], values):
+            step &= Q(**{previous.lstrip('-'): value})
+        condition |= step
+    return condition
+
+
+def keyset_page(queryset, ordering, cursor=None, page_size=20):
+    """
+    Returns one page of the queryset and the cursor of the next page.
+    The ordering must end with a unique field, so that the position of
+    every row is defined by the values of the ordering fields
+    """
+    queryset = queryset.order_by(*ordering)
+    values = decode_cursor(cursor) if cursor else None
+    if values:
+        values = cursor_values(queryset, ordering, values)
+    if values:
+        queryset = queryset.filter(keyset_filter(ordering, values))
+    rows = list(queryset[:page_size + 1])
+    next_cursor = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        next_cursor = encode_cursor([_field_value(rows[-1], field) for field in ordering])
+    return rows, next_cursor
@@ -0,0 +1,103 @@
+import datetime
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.utils import timezone
+
+from market.carts import clear_cart
+from market.helpers import payment_imitation
+from market.models import Cart, Order
+from market.sales import record_sales
+
+PAYMENT_ERROR = 'Payment is failed. Incorrect account data'
+PAYMENT_FAILURE = 'Payment is failed. Please try again later'
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """Thread pool shared by all payment attempts of the process"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=getattr(settings, 'PAYMENT_WORKERS', 4),
+                                           thread_name_prefix='payment')
+    return _executor
+
+
+def enqueue_payment(order, card_num):
+    """
+    Marks the order as pending and hands the payment over to the worker
+    pool once the current transaction is committed
+    """
+    model = type(order)
+    model.objects.filter(id=order.id).update(payment_pending=True, payment_started=timezone.now(), error=None)
+    transaction.on_commit(
+        lambda: get_executor().submit(_run_in_worker, model, order.id, card_num)
+    )
+
+
+def payment_in_flight(order):
+    """
+    Whether a worker may still be settling the order. A payment pending for
+    longer than PAYMENT_TIMEOUT was lost, e.g. with a restart of the process
+    """
+    if not order.payment_pending or order.payment_started is None:
+        return False
+    timeout = datetime.timedelta(seconds=getattr(settings, 'PAYMENT_TIMEOUT', 60))
+    return timezone.now() - order.payment_started < timeout
+
+
+def fail_payment(model, order_id, error=PAYMENT_FAILURE):
+    """Ends a payment that could not be settled, so that it can be tried again"""
+    model.objects.filter(id=order_id, payment_status=False) \
+                 .update(payment_pending=False, error=error)
+
+
+def _run_in_worker(model, order_id, card_num):
+    try:
+        return settle_payment(model, order_id, card_num)
+    except Exception:
+        logger.exception('Payment of %s %s failed', model.__name__, order_id)
+        try:
+            fail_payment(model, order_id)
+        except Exception:
+            logger.exception('Payment of %s %s is left pending', model.__name__, order_id)
+        return False
+    finally:
+        connections.close_all()
+
+
+def settle_payment(model, order_id, card_num):
+    """Runs the payment of the order and stores its result"""
+    try:
+        paid = payment_imitation(card_num)
+    except (ValueError, IndexError):
+        paid = False
+    with transaction.atomic():
+        order = model.objects.select_for_update().get(id=order_id)
+        if order.payment_status:
+            return True
+        order.payment_pending = False
+        if paid:
+            order.payment_status = True
+            order.error = None
+        else:
+            order.error = PAYMENT_ERROR
+        order.save(update_fields=['payment_pending', 'payment_status', 'error'])
+        if paid:
+            record_sales(order)
+            if model is Order:
+                cart_id = Cart.objects.filter(profile_id=order.profile_id) \
+                                      .values_list('id', flat=True).first()
+                if cart_id is not None:
+                    clear_cart(cart_id=cart_id)
+            else:
+                clear_cart(session_key=order.session_key)
+    return paid
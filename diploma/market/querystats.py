@@ -0,0 +1,164 @@
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from collections import defaultdict, deque
+
+from django.conf import settings
+from django.template.backends.django import Template
+
+logger = logging.getLogger('market.querystats')
+
+METRICS = ('queries', 'sql_ms', 'template_ms', 'bytes')
+PERCENTILES = (50, 95, 99)
+
+_local = threading.local()
+_templates_instrumented = False
+
+
+def current_sample():
+    """Sample of the request handled by the current thread, if it is measured"""
+    return getattr(_local, 'sample', None)
+
+
+def start_sample():
+    _local.sample = dict.fromkeys(METRICS, 0)
+    return _local.sample
+
+
+def finish_sample():
+    return _local.__dict__.pop('sample', None)
+
+
+def instrument_templates():
+    """Makes template rendering add its duration to the current sample"""
+    global _templates_instrumented
+    if _templates_instrumented:
+        return
+    render = Template.render
+
+    @functools.wraps(render)
+    def timed_render(self, *args, **kwargs):
+        sample = current_sample()
+        if sample is None:
+            return render(self, *args, **kwargs)
+        start = time.perf_counter()
+        try:
+            return render(self, *args, **kwargs)
+        finally:
+            sample['template_ms'] += (time.perf_counter() - start) * 1000
+
+    Template.render = timed_render
+    _templates_instrumented = True
+
+
+def percentile(values, rank):
+    """Nearest-rank percentile of a sorted list"""
+    if not values:
+        return 0
+    index = max(0, min(len(values) - 1, -(-rank * len(values) // 100) - 1))
+    return values[index]
+
+
+def summarize(samples):
+    """Number of requests and percentiles of every metric for each view"""
+    by_view = defaultdict(list)
+    for sample in samples:
+        by_view[sample['view']].append(sample)
+    report = {}
+    for view, view_samples in sorted(by_view.items()):
+        row = {'requests': len(view_samples)}
+        for metric in METRICS:
+            values = sorted(sample[metric] for sample in view_samples)
+            for rank in PERCENTILES:
+                row[f'{metric}_p{rank}'] = round(percentile(values, rank), 2)
+        report[view] = row
+    return report
+
+
+class QueryStats:
+
+    """Samples of the recent requests of the process, grouped by view"""
+
+    def __init__(self, max_samples=1000):
+        self.max_samples = max_samples
+        self.lock = threading.Lock()
+        self.samples = defaultdict(lambda: deque(maxlen=self.max_samples))
+        self.recorded = 0
+
+    def record(self, view, sample):
+        with self.lock:
+            self.samples[view].append(dict(sample, view=view))
+            self.recorded += 1
+            return self.recorded
+
+    def drain(self):
+        with self.lock:
+            samples = [sample for view_samples in self.samples.values() for sample in view_samples]
+            self.samples.clear()
+            self.recorded = 0
+        return samples
+
+    def summary(self):
+        with self.lock:
+            samples = [sample for view_samples in self.samples.values() for sample in view_samples]
+        return summarize(samples)
+
+    def flush(self):
+        """
+        Logs the summary of the collected samples and appends them to
+        QUERY_STATS_FILE, which is rotated once it exceeds QUERY_STATS_FILE_MAX_BYTES
+        """
+        samples = self.drain()
+        if not samples:
+            return {}
+        report = summarize(samples)
+        for view, row in report.items():
+            logger.info('%s %s', view, json.dumps(row))
+        path = getattr(settings, 'QUERY_STATS_FILE', None)
+        if path:
+            rotate(path, getattr(settings, 'QUERY_STATS_FILE_MAX_BYTES', None))
+            with open(path, 'a') as stats_file:
+                for sample in samples:
+                    stats_file.write(json.dumps(sample) + '\n')
+        return report
+
+
+def rotated_path(path):
+    return f'{path}.1'
+
+
+def rotate(path, max_bytes):
+    """Moves a file larger than max_bytes aside, replacing the one rotated before"""
+    try:
+        if max_bytes and os.path.getsize(path) >= max_bytes:
+            os.replace(path, rotated_path(path))
+    except FileNotFoundError:
+        pass
+
+
+def read_samples(path):
+    """Samples of the file and of its rotated part, oldest first"""
+    samples = []
+    for name in (rotated_path(path), path):
+        try:
+            with open(name) as stats_file:
+                for line in stats_file:
+                    if line.strip():
+                        samples.append(json.loads(line))
+        except FileNotFoundError:
+            pass
+    return samples
+
+
+def remove_samples(path):
+    for name in (rotated_path(path), path):
+        try:
+            os.remove(name)
+        except FileNotFoundError:
+            pass
+
+
+stats = QueryStats(getattr(settings, 'QUERY_STATS_SAMPLES', 1000))
@@ -0,0 +1,33 @@
+from django.db.models import Count, Exists, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from market.models import Item, Review
+from market.pagination import keyset_page
+
+REVIEWS_PAGE_SIZE = 3
+REVIEWS_ORDERING = ('id',)
+
+
+def review_page(item_id, cursor=None, page_size=REVIEWS_PAGE_SIZE):
+    """One page of the reviews of an item with their authors, and the cursor of the next page"""
+    reviews = Review.objects.filter(item_id=item_id).select_related('author__user')
+    return keyset_page(reviews, REVIEWS_ORDERING, cursor, page_size)
+
+
+def serialize_review(review):
+    return {
+        'id': review.id,
+        'author': str(review.author),
+        'description': review.description,
+        'date_created': review.date_created,
+    }
+
+
+def recount_reviews():
+    """Rebuilds review counters of all items from one grouped aggregate"""
+    counts = Review.objects.filter(item=OuterRef('pk')) \
+                           .values('item') \
+                           .annotate(total=Count('id')) \
+                           .values('total')
+    return Item.objects.update(number_of_reviews=Coalesce(Subquery(counts), 0),
+                               has_reviews=Exists(Review.objects.filter(item=OuterRef('pk'))))
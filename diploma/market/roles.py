@@ -0,0 +1,76 @@
+import time
+
+from django.contrib.auth.models import Group, User
+from django.core.cache import cache
+
+ADMINS_GROUP = 'Admins'
+USERS_GROUP = 'Users'
+ADMIN_SESSION_KEY = 'is_admin'
+
+_group_ids = {}
+
+
+def group_id(name):
+    """Id of a role group, read from the database once per process"""
+    if name not in _group_ids:
+        _group_ids[name] = Group.objects.get(name=name).id
+    return _group_ids[name]
+
+
+def forget_groups(**kwargs):
+    _group_ids.clear()
+
+
+def _roles_version_key(user_id):
+    return f'market:roles:{user_id}'
+
+
+def get_roles_version(user_id):
+    # A fresh value after eviction makes every stored flag of the user stale
+    return cache.get_or_set(_roles_version_key(user_id), time.time_ns(), None)
+
+
+def invalidate_roles(user_id):
+    cache.set(_roles_version_key(user_id), time.time_ns(), None)
+
+
+def set_admin_group(user_id, admin):
+    """Moves the user to the Admins or to the Users group"""
+    Membership = User.groups.through
+    target, other = (ADMINS_GROUP, USERS_GROUP) if admin else (USERS_GROUP, ADMINS_GROUP)
+    Membership.objects.filter(user_id=user_id, group__name=other).delete()
+    Membership.objects.bulk_create([Membership(user_id=user_id, group_id=group_id(target))],
+                                   ignore_conflicts=True)
+    invalidate_roles(user_id)
+
+
+def membership_changed(sender, instance, action, pk_set, **kwargs):
+    """Makes the stored flags stale when group membership is edited directly"""
+    if isinstance(instance, User):
+        if action.startswith('post_'):
+            invalidate_roles(instance.id)
+        return
+    if action == 'pre_clear':
+        pk_set = User.objects.filter(groups=instance).values_list('id', flat=True)
+    elif not action.startswith('post_') or action == 'post_clear':
+        return
+    for user_id in pk_set:
+        invalidate_roles(user_id)
+
+
+def is_admin(request):
+    """
+    Whether the current user belongs to the Admins group. The answer is kept
+    in the session until the roles of the user change
+    """
+    user = request.user
+    if not user.is_authenticated:
+        return False
+    version = get_roles_version(user.id)
+    stored = request.session.get(ADMIN_SESSION_KEY)
+    if stored and stored[0] == user.id and stored[2] == version:
+        return stored[1]
+    admin = User.groups.through.objects.filter(user_id=user.id,
+                                               group_id=group_id(ADMINS_GROUP)).exists()
+    request.session[ADMIN_SESSION_KEY] = [user.id, admin, version]
+    return admin
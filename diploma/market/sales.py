@@ -0,0 +1,108 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+from market.models import (Best_seller, Item, Item_in_order,
+                           Item_in_unauthorised_order, Order)
+
+BEST_SELLERS_VERSION_KEY = 'market:best_sellers:version'
+
+
+def best_sellers_count():
+    return getattr(settings, 'BEST_SELLERS_COUNT', 10)
+
+
+def record_sales(order):
+    """
+    Adds the quantities of a paid order to Item.times_bought with one UPDATE
+    and refreshes the rankings of the categories of the sold items
+    """
+    line_model = Item_in_order if isinstance(order, Order) else Item_in_unauthorised_order
+    lines = line_model.objects.filter(order_id=order.id)
+    sold = lines.filter(item=OuterRef('pk')) \
+                .values('item') \
+                .annotate(total=Sum('quantity')) \
+                .values('total')
+    items = Item.objects.filter(id__in=lines.values('item_id'))
+    with transaction.atomic(savepoint=False):
+        items.update(times_bought=F('times_bought') + Subquery(sold))
+        refresh_rankings(items.values_list('category_id', flat=True).distinct())
+
+
+def refresh_rankings(category_ids):
+    """Rebuilds the top of the given categories only, returns the number of ranked items"""
+    ranked = 0
+    size = best_sellers_count()
+    category_ids = set(category_ids) - {None}
+    with transaction.atomic(savepoint=False):
+        for category_id in category_ids:
+            top = Item.objects.filter(category_id=category_id, status=True, times_bought__gt=0) \
+                              .order_by('-times_bought', 'id') \
+                              .values_list('id', 'times_bought')[:size]
+            Best_seller.objects.filter(category_id=category_id).delete()
+            ranked += len(Best_seller.objects.bulk_create([
+                Best_seller(category_id=category_id, item_id=item_id, rank=rank, times_bought=times_bought)
+                for rank, (item_id, times_bought) in enumerate(top, start=1)
+            ]))
+    invalidate_best_sellers(category_ids)
+    return ranked
+
+
+def refresh_all_rankings():
+    return refresh_rankings(Item.objects.values_list('category_id', flat=True).distinct())
+
+
+def _paid_quantity(line_model):
+    paid = line_model.objects.filter(item=OuterRef('pk'), order__payment_status=True) \
+                             .values('item') \
+                             .annotate(total=Sum('quantity')) \
+                             .values('total')
+    return Coalesce(Subquery(paid), 0)
+
+
+def recount_times_bought():
+    """Recomputes Item.times_bought of all items from the lines of paid orders with one UPDATE"""
+    return Item.objects.update(times_bought=_paid_quantity(Item_in_order) +
+                                            _paid_quantity(Item_in_unauthorised_order))
+
+
+def _version_key(category_id):
+    return f'{BEST_SELLERS_VERSION_KEY}:{category_id or "all"}'
+
+
+def get_best_sellers_version(category_id=None):
+    return cache.get_or_set(_version_key(category_id), time.time_ns(), None)
+
+
+def invalidate_best_sellers(category_ids=()):
+    """Drops the cached best sellers of the categories and of the whole shop"""
+    for category_id in {*category_ids, None}:
+        cache.set(_version_key(category_id), time.time_ns(), None)
+
+
+def invalidate_item_best_sellers(sender, instance, **kwargs):
+    invalidate_best_sellers([instance.category_id, getattr(instance, '_saved_category_id', None)])
+
+
+def get_best_sellers(category_id=None):
+    """
+    Best selling active items of a category, or of the whole shop when no
+    category is given. Read from the ranking table and kept in the cache
+    until a ranking or an item changes
+    """
+    key = f'market:best_sellers:{get_best_sellers_version(category_id)}:{category_id or "all"}'
+    items = cache.get(key)
+    if items is None:
+        rows = Best_seller.objects.filter(item__status=True,
+                                          item__category_id=F('category_id'))
+        if category_id is not None:
+            rows = rows.filter(category_id=category_id).order_by('rank')
+        else:
+            rows = rows.order_by('-times_bought', 'item_id')
+        items = [row.item for row in rows.select_related('item')[:best_sellers_count()]]
+        cache.set(key, items, getattr(settings, 'BEST_SELLERS_CACHE_TIMEOUT', 3600))
+    return items
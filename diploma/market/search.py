@@ -0,0 +1,137 @@
+import re
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import FloatField, Q
+from django.db.models.expressions import RawSQL
+
+from market.models import Item, Order, Profile, Unauthorised_order
+from market.pagination import fits_integer, keyset_page
+
+FTS_TABLE = 'market_item_fts'
+MODERATOR_ENTITIES = ('users', 'orders', 'guest_orders', 'products')
+
+_fts5_support = {}
+
+
+def fts_enabled(using=connection):
+    """Full-text index is used only on SQLite with FTS5 compiled in"""
+    if using.vendor != 'sqlite' or not getattr(settings, 'SEARCH_FTS', True):
+        return False
+    if using.alias not in _fts5_support:
+        with using.cursor() as cursor:
+            cursor.execute('PRAGMA compile_options')
+            _fts5_support[using.alias] = ('ENABLE_FTS5',) in cursor.fetchall()
+    return _fts5_support[using.alias]
+
+
+def ensure_index(using=connection):
+    """Creates the index table and fills it if it did not exist yet"""
+    if not fts_enabled(using):
+        return
+    if FTS_TABLE in using.introspection.table_names():
+        return
+    with using.cursor() as cursor:
+        cursor.execute(f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5("
+                       f"name, description, "
+                       f"prefix='2 3', tokenize='unicode61 remove_diacritics 2')")
+    rebuild_index(using)
+
+
+def rebuild_index(using=connection):
+    with using.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE}')
+        cursor.execute(f'INSERT INTO {FTS_TABLE} (rowid, name, description) '
+                       f'SELECT id, name, description FROM {Item._meta.db_table}')
+        cursor.execute(f'SELECT count(*) FROM {FTS_TABLE}')
+        return cursor.fetchone()[0]
+
+
+def index_item(item):
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [item.id])
+        cursor.execute(f'INSERT INTO {FTS_TABLE} (rowid, name, description) VALUES (%s, %s, %s)',
+                       [item.id, item.name, item.description])
+
+
+def remove_item(item_id):
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [item_id])
+
+
+def build_match_expression(query):
+    """Every word of the query becomes a quoted prefix term"""
+    words = re.findall(r'\w+', query)
+    return ' '.join(f'"{word}"*' for word in words)
+
+
+def search_items(items, query):
+    """
+    Narrows a queryset of items down to those matching the query. On SQLite
+    the FTS5 index is used and results are ordered by relevance, other
+    backends fall back to a case-insensitive substring search
+    """
+    if not query or not query.strip():
+        return items
+    if not fts_enabled():
+        return items.filter(Q(name__icontains=query) | Q(description__icontains=query))
+    expression = build_match_expression(query)
+    if not expression:
+        return items.none()
+    # The index is joined, so MATCH runs once and bm25 reads the rank of the joined row
+    item_id = f'"{Item._meta.db_table}"."id"'
+    return items.extra(
+        tables=[FTS_TABLE],
+        where=[f'{FTS_TABLE}.rowid = {item_id}', f'{FTS_TABLE} MATCH %s'],
+        params=[expression],
+    ).annotate(
+        search_rank=RawSQL(f'bm25({FTS_TABLE}, 10.0, 1.0)', [], output_field=FloatField())
+    ).order_by('search_rank', 'id')
+
+
+def _moderator_querysets(query, category_id=None):
+    """
+    One query per entity type, relations are joined instead of fetched
+    separately. Products use the full-text index; SQLite has no trigram
+    index, so users and orders are matched with a substring LIKE
+    """
+    number = Q(id=int(query)) if query.isdecimal() and fits_integer(int(query)) else Q()
+    users = Profile.objects.select_related('user') \
+                           .only('id', 'tel', 'user__username', 'user__email') \
+                           .filter(Q(user__username__icontains=query) |
+                                   Q(user__email__icontains=query) |
+                                   Q(tel__icontains=query))
+    orders = Order.objects.select_related('profile__user') \
+                          .only('id', 'date_of_order', 'price', 'tel', 'profile__user__username') \
+                          .filter(Q(profile__user__username__icontains=query) |
+                                  Q(tel__icontains=query) | number)
+    guest_orders = Unauthorised_order.objects.only('id', 'session_key', 'name', 'tel',
+                                                   'date_of_order', 'price') \
+                                             .filter(Q(name__icontains=query) |
+                                                     Q(tel__icontains=query) |
+                                                     Q(session_key=query) | number)
+    items = Item.objects.filter(status=True).only('id', 'name', 'price')
+    if category_id is not None:
+        items = items.filter(category_id=category_id)
+    products = search_items(items, query)
+    products_ordering = ('search_rank', 'id') if 'search_rank' in products.query.annotations else ('name', 'id')
+    return {
+        'users': (users, ('user__username', 'id')),
+        'orders': (orders, ('-date_of_order', '-id')),
+        'guest_orders': (guest_orders, ('-date_of_order', '-id')),
+        'products': (products, products_ordering),
+    }
+
+
+def moderator_search(query, cursors=None, page_size=20, entities=MODERATOR_ENTITIES, category_id=None):
+    """
+    Searches users, orders, guest orders and products for one query. Returns
+    a page of hits and the cursor of the next page for every entity type
+    """
+    query = (query or '').strip()
+    if not query:
+        return {entity: ([], None) for entity in entities}
+    cursors = cursors or {}
+    querysets = _moderator_querysets(query, category_id)
+    return {entity: keyset_page(*querysets[entity], cursors.get(entity), page_size)
+            for entity in entities}
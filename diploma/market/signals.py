@@ -0,0 +1,67 @@
+from django.contrib.auth.models import Group, User
+from django.db import connections
+from django.db.models.signals import (m2m_changed, post_delete, post_migrate,
+                                      post_save)
+
+from market import search
+from market.cache import invalidate_categories, invalidate_prices
+from market.catalogue import (category_changed, item_changed,
+                              item_image_changed, review_changed)
+from market.models import Item, Item_category, Item_image, Review
+from market.roles import forget_groups, membership_changed
+from market.sales import invalidate_item_best_sellers
+
+
+def index_item(sender, instance, **kwargs):
+    if search.fts_enabled():
+        search.index_item(instance)
+
+
+def remove_item_from_index(sender, instance, **kwargs):
+    if search.fts_enabled():
+        search.remove_item(instance.id)
+
+
+def create_search_index(sender, using, **kwargs):
+    search.ensure_index(connections[using])
+
+
+def connect_signals(app_config):
+    post_save.connect(invalidate_categories, sender=Item_category,
+                      dispatch_uid='market_categories_save')
+    post_delete.connect(invalidate_categories, sender=Item_category,
+                        dispatch_uid='market_categories_delete')
+    post_save.connect(index_item, sender=Item,
+                      dispatch_uid='market_search_index_save')
+    post_delete.connect(remove_item_from_index, sender=Item,
+                        dispatch_uid='market_search_index_delete')
+    post_save.connect(invalidate_prices, sender=Item,
+                      dispatch_uid='market_prices_save')
+    post_save.connect(invalidate_item_best_sellers, sender=Item,
+                      dispatch_uid='market_best_sellers_save')
+    post_delete.connect(invalidate_item_best_sellers, sender=Item,
+                        dispatch_uid='market_best_sellers_delete')
+    post_save.connect(forget_groups, sender=Group,
+                      dispatch_uid='market_role_groups_save')
+    post_delete.connect(forget_groups, sender=Group,
+                        dispatch_uid='market_role_groups_delete')
+    m2m_changed.connect(membership_changed, sender=User.groups.through,
+                        dispatch_uid='market_role_membership')
+    post_save.connect(item_changed, sender=Item,
+                      dispatch_uid='market_catalogue_item_save')
+    post_delete.connect(item_changed, sender=Item,
+                        dispatch_uid='market_catalogue_item_delete')
+    post_save.connect(item_image_changed, sender=Item_image,
+                      dispatch_uid='market_catalogue_image_save')
+    post_delete.connect(item_image_changed, sender=Item_image,
+                        dispatch_uid='market_catalogue_image_delete')
+    post_save.connect(category_changed, sender=Item_category,
+                      dispatch_uid='market_catalogue_category_save')
+    post_delete.connect(category_changed, sender=Item_category,
+                        dispatch_uid='market_catalogue_category_delete')
+    post_save.connect(review_changed, sender=Review,
+                      dispatch_uid='market_catalogue_review_save')
+    post_delete.connect(review_changed, sender=Review,
+                        dispatch_uid='market_catalogue_review_delete')
+    post_migrate.connect(create_search_index, sender=app_config,
+                         dispatch_uid='market_search_index_create')
@@ -0,0 +1,178 @@
+import datetime
+import random
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import Group, User
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from market import search
+from market.cache import invalidate_categories, invalidate_prices
+from market.carts import reconcile_carts
+from market.models import (Cart, Item, Item_category, Item_image, Item_in_cart,
+                           Item_in_order, Item_in_unauthorised_order,
+                           Item_in_unauthorized_cart, Order, Profile, Review,
+                           Unauthorised_order)
+from market.reviews import recount_reviews
+from market.sales import recount_times_bought, refresh_all_rankings
+
+PASSWORD = 'synthetic_pass_1'
+IMAGE = 'logo.PNG'
+
+WORDS = ['smart', 'pro', 'mini', 'max', 'ultra', 'classic', 'wireless', 'compact',
+         'steel', 'silver', 'black', 'white', 'sport', 'home', 'travel', 'eco']
+NOUNS = ['phone', 'watch', 'laptop', 'tablet', 'camera', 'speaker', 'headphones',
+         'charger', 'keyboard', 'mouse', 'monitor', 'router', 'lamp', 'kettle']
+
+DEFAULTS = {
+    'users': 200,
+    'categories': 10,
+    'items': 2000,
+    'images': 2,
+    'reviews': 10000,
+    'cart_lines': 3,
+    'guest_carts': 100,
+    'orders': 1000,
+    'order_lines': 3,
+}
+
+
+def _bulk_create(model, objects, batch_size):
+    """Bulk insert that leaves primary keys set on every backend"""
+    if connection.features.can_return_rows_from_bulk_insert:
+        return model.objects.bulk_create(objects, batch_size=batch_size)
+    for obj in objects:
+        obj.save()
+    return objects
+
+
+def _phrase(rng, words):
+    return ' '.join(rng.sample(WORDS, words - 1) + [rng.choice(NOUNS)])
+
+
+def generate(seed=0, batch_size=1000, **volumes):
+    """
+    Bulk-creates a consistent data set of the given volumes. Users get the
+    password PASSWORD and the first of them is an admin. Review and sales
+    counters, cart totals, rankings and the search index
+    are rebuilt afterwards. Returns the number of created rows per kind
+    """
+    volumes = dict(DEFAULTS, **volumes)
+    rng = random.Random(seed)
+    now = timezone.now()
+    created = {}
+    with transaction.atomic():
+        password = make_password(PASSWORD)
+        first_user = (User.objects.aggregate(last=Max('id'))['last'] or 0) + 1
+        users = _bulk_create(User, [
+            User(username=f'user_{number}', email=f'user_{number}@example.com', password=password)
+            for number in range(first_user, first_user + volumes['users'])
+        ], batch_size)
+        profiles = _bulk_create(Profile, [
+            Profile(user=user, tel=f'9{rng.randrange(10 ** 9):09d}', admin=not number)
+            for number, user in enumerate(users)
+        ], batch_size)
+        groups = {admin: Group.objects.get_or_create(name=name)[0].id
+                  for admin, name in ((True, 'Admins'), (False, 'Users'))}
+        User.groups.through.objects.bulk_create([
+            User.groups.through(user_id=profile.user_id, group_id=groups[profile.admin])
+            for profile in profiles
+        ], batch_size=batch_size, ignore_conflicts=True)
+        carts = _bulk_create(Cart, [Cart(profile=profile) for profile in profiles], batch_size)
+        created['users'] = len(users)
+
+        first_category = (Item_category.objects.aggregate(last=Max('id'))['last'] or 0) + 1
+        categories = _bulk_create(Item_category, [
+            Item_category(name=f'{rng.choice(NOUNS).capitalize()}s {number}')
+            for number in range(first_category, first_category + volumes['categories'])
+        ], batch_size)
+        created['categories'] = len(categories)
+        if not categories:
+            return created
+
+        items = _bulk_create(Item, [
+            Item(name=_phrase(rng, 3).capitalize(),
+                 description=' '.join(_phrase(rng, 4) for _ in range(3)),
+                 price=rng.randint(1, 5000),
+                 category=rng.choice(categories),
+                 date_created=now - datetime.timedelta(days=rng.randrange(365)),
+                 limited=rng.random() < 0.05)
+            for _ in range(volumes['items'])
+        ], batch_size)
+        created['items'] = len(items)
+        if not items:
+            return created
+
+        created['images'] = len(Item_image.objects.bulk_create([
+            Item_image(item=item, image=IMAGE)
+            for item in items for _ in range(volumes['images'])
+        ], batch_size=batch_size))
+
+        if profiles:
+            created['reviews'] = len(Review.objects.bulk_create([
+                Review(item=rng.choice(items), author=rng.choice(profiles),
+                       description=_phrase(rng, 4))
+                for _ in range(volumes['reviews'])
+            ], batch_size=batch_size))
+
+        lines = {}
+        for cart in carts:
+            for item in rng.sample(items, min(volumes['cart_lines'], len(items))):
+                lines[cart.id, item.id] = Item_in_cart(cart=cart, item=item, quantity=rng.randint(1, 3))
+        created['cart_lines'] = len(Item_in_cart.objects.bulk_create(lines.values(),
+                                                                     batch_size=batch_size))
+        guest_lines = []
+        for number in range(volumes['guest_carts']):
+            session_key = str(rng.getrandbits(128))
+            guest_lines += [Item_in_unauthorized_cart(session_key=session_key, item=item,
+                                                      quantity=rng.randint(1, 3))
+                            for item in rng.sample(items, min(volumes['cart_lines'], len(items)))]
+        created['guest_cart_lines'] = len(Item_in_unauthorized_cart.objects.bulk_create(
+            guest_lines, batch_size=batch_size))
+
+        created.update(_generate_orders(rng, profiles, items, volumes, now, batch_size))
+
+        recount_reviews()
+        recount_times_bought()
+        refresh_all_rankings()
+        reconcile_carts()
+    if search.fts_enabled():
+        search.ensure_index()
+        search.rebuild_index()
+    invalidate_categories()
+    invalidate_prices()
+    return created
+
+
+def _generate_orders(rng, profiles, items, volumes, now, batch_size):
+    orders, guest_orders = [], []
+    for _ in range(volumes['orders']):
+        fields = {
+            'date_of_order': now - datetime.timedelta(minutes=rng.randrange(525600)),
+            'payment_status': rng.random() < 0.7,
+            'delivery_method': rng.choice(['delivery', 'in shop']),
+            'city': rng.choice(['Moscow', 'Kazan', 'Omsk']),
+            'adress': f'{rng.randint(1, 200)} {rng.choice(WORDS).capitalize()} street',
+            'tel': f'9{rng.randrange(10 ** 9):09d}',
+        }
+        if profiles and rng.random() < 0.8:
+            orders.append(Order(profile=rng.choice(profiles), **fields))
+        else:
+            guest_orders.append(Unauthorised_order(session_key=str(rng.getrandbits(128)), **fields))
+    orders = _bulk_create(Order, orders, batch_size)
+    guest_orders = _bulk_create(Unauthorised_order, guest_orders, batch_size)
+    created_lines = 0
+    for order_model, line_model, model_orders in ((Order, Item_in_order, orders),
+                                                  (Unauthorised_order, Item_in_unauthorised_order,
+                                                   guest_orders)):
+        lines = []
+        for order in model_orders:
+            order_lines = [line_model(order=order, item=item, quantity=rng.randint(1, 3),
+                                      price_of_item=item.price)
+                           for item in rng.sample(items, min(volumes['order_lines'], len(items)))]
+            order.price = sum(line.quantity * line.price_of_item for line in order_lines)
+            lines += order_lines
+        created_lines += len(line_model.objects.bulk_create(lines, batch_size=batch_size))
+        order_model.objects.bulk_update(model_orders, ['price'], batch_size=batch_size)
+    return {'orders': len(orders) + len(guest_orders), 'order_lines': created_lines}
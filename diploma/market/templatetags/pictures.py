@@ -0,0 +1,14 @@
+from django import template
+from django.core.files.storage import default_storage
+
+register = template.Library()
+
+@register.inclusion_tag('market/picture.html')
+def picture(source, derivatives, size, alt='', style=''):
+    """WebP derivative of the image with the JPEG or PNG one for browsers without WebP"""
+    files = (derivatives or {}).get(size)
+    if files:
+        return {'webp': default_storage.url(files['webp']),
+                'src': default_storage.url(files['fallback']),
+                'alt': alt, 'style': style}
+    return {'src': source.url if source else '', 'alt': alt, 'style': style}
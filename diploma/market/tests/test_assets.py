@@ -0,0 +1,111 @@
+import gzip
+import os
+import shutil
+import tempfile
+
+from django.core.files.base import ContentFile
+from django.test import TestCase, override_settings
+from django.utils.http import http_date
+
+from market.assets import CompressedManifestStaticFilesStorage, compress_file
+
+CSS = b'body { color: red; }\n' * 100
+
+
+class MediaServingTest(TestCase):
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.write('avatars/photo.png', b'0123456789' * 10)
+
+    def write(self, name, data):
+        path = os.path.join(self.media_root, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as file:
+            file.write(data)
+        return path
+
+    def test_file_is_served_with_validators(self):
+        response = self.client.get('/media/avatars/photo.png')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), b'0123456789' * 10)
+        self.assertEqual(response['Content-Type'], 'image/png')
+        self.assertEqual(response['Cache-Control'], 'public, max-age=3600')
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertFalse(response.has_header('Vary'))
+        stat = os.stat(os.path.join(self.media_root, 'avatars/photo.png'))
+        self.assertEqual(response['Last-Modified'], http_date(stat.st_mtime))
+
+        response = self.client.get('/media/avatars/photo.png', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+        response = self.client.get('/media/avatars/photo.png', HTTP_IF_MODIFIED_SINCE=http_date(stat.st_mtime))
+        self.assertEqual(response.status_code, 304)
+
+    def test_missing_and_outside_files_are_not_found(self):
+        self.assertEqual(self.client.get('/media/avatars/missing.png').status_code, 404)
+        self.assertEqual(self.client.get('/media/../manage.py').status_code, 404)
+
+    def test_byte_ranges(self):
+        response = self.client.get('/media/avatars/photo.png', HTTP_RANGE='bytes=5-14')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(b''.join(response.streaming_content), b'5678901234')
+        self.assertEqual(response['Content-Range'], 'bytes 5-14/100')
+        response = self.client.get('/media/avatars/photo.png', HTTP_RANGE='bytes=-3')
+        self.assertEqual(b''.join(response.streaming_content), b'789')
+        response = self.client.get('/media/avatars/photo.png', HTTP_RANGE='bytes=200-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], 'bytes */100')
+        response = self.client.get('/media/avatars/photo.png', HTTP_RANGE='bytes=5-14', HTTP_IF_RANGE='"old"')
+        self.assertEqual(response.status_code, 200)
+
+    def test_derived_images_are_immutable(self):
+        self.write('item_images/derived/photo_thumb.0123456789abcdef.webp', b'webp')
+        response = self.client.get('/media/item_images/derived/photo_thumb.0123456789abcdef.webp')
+        self.assertEqual(response['Cache-Control'], 'public, max-age=31536000, immutable')
+
+    def test_precompressed_variant_is_negotiated(self):
+        path = self.write('files/app.css', CSS)
+        compress_file(path)
+        response = self.client.get('/media/files/app.css', HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Content-Type'], 'text/css')
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+        self.assertEqual(gzip.decompress(b''.join(response.streaming_content)), CSS)
+        response = self.client.get('/media/files/app.css')
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertEqual(b''.join(response.streaming_content), CSS)
+
+    def test_encodings_are_parsed_with_q_values(self):
+        self.write('files/app.css', CSS)
+        self.write('files/app.css.gz', gzip.compress(CSS))
+        for header, encoding in (('gzip;q=0, deflate', None),
+                                 ('GZIP ; q=0.0', None),
+                                 ('gzipped', None),
+                                 ('deflate, *;q=0.5', 'gzip'),
+                                 ('*, gzip;q=0', None),
+                                 ('br;q=0, gzip;q=0.8', 'gzip')):
+            with self.subTest(header=header):
+                response = self.client.get('/media/files/app.css', HTTP_ACCEPT_ENCODING=header)
+                self.assertEqual(response.get('Content-Encoding'), encoding)
+
+
+class CompressedManifestStorageTest(TestCase):
+
+    def test_collected_files_are_hashed_and_compressed(self):
+        static_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, static_root)
+        storage = CompressedManifestStaticFilesStorage(location=static_root)
+        for name, data in (('css/app.css', CSS), ('img/tiny.txt', b'x')):
+            storage.save(name, ContentFile(data))
+        paths = {name: (storage, name) for name in ('css/app.css', 'img/tiny.txt')}
+        processed = list(storage.post_process(paths))
+        self.assertEqual(len(processed), 2)
+        hashed = storage.stored_name('css/app.css')
+        self.assertRegex(hashed, r'^css/app\.[0-9a-f]{12}\.css$')
+        with open(storage.path(hashed + '.gz'), 'rb') as file:
+            self.assertEqual(gzip.decompress(file.read()), CSS)
+        self.assertFalse(os.path.exists(storage.path('img/tiny.txt.gz')))
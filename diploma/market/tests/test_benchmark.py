@@ -0,0 +1,64 @@
+import os
+import tempfile
+from io import StringIO
+
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+
+from market import benchmark
+from market.models import Cart, Item, Item_category, Profile, Review, User
+from market.synthetic import generate
+
+
+class SyntheticDataTest(TestCase):
+
+    def test_generated_data_is_consistent(self):
+        created = generate(users=5, categories=2, items=20, reviews=30, orders=10, guest_carts=3)
+        self.assertEqual(created['users'], 5)
+        self.assertEqual(User.objects.count(), 5)
+        self.assertEqual(Profile.objects.filter(admin=True).count(), 1)
+        self.assertEqual(Cart.objects.count(), 5)
+        self.assertEqual(Item_category.objects.count(), 2)
+        self.assertEqual(sum(Item.objects.values_list('number_of_reviews', flat=True)),
+                         Review.objects.count())
+        call_command('reconcile_carts', '--check', stdout=StringIO())
+
+    def test_command_takes_volumes(self):
+        out = StringIO()
+        call_command('generate_data', '--users=2', '--items=5', '--reviews=0', '--orders=0',
+                     '--guest-carts=0', '--categories=1', stdout=out)
+        self.assertEqual(Item.objects.count(), 5)
+        self.assertIn('items: 5', out.getvalue())
+
+
+class BenchmarkTest(TestCase):
+
+    def test_run_reports_every_scenario(self):
+        generate(users=3, categories=1, items=10, reviews=10, orders=5, guest_carts=1)
+        results = benchmark.run(repeat=1, warmup=0, scenarios=['main', 'cart', 'moderator_products'])
+        self.assertEqual(set(results), {'main', 'cart', 'moderator_products'})
+        self.assertTrue(all(result['status'] == 200 for result in results.values()))
+
+    def test_compare_flags_more_queries_and_other_statuses(self):
+        baseline = {'main': {'queries': 2, 'status': 200}, 'cart': {'queries': 3, 'status': 200}}
+        results = {'main': {'queries': 3, 'status': 200, 'median_ms': 10},
+                   'cart': {'queries': 3, 'status': 500, 'median_ms': 1},
+                   'order': {'queries': 9, 'status': 200, 'median_ms': 99}}
+        regressions = benchmark.compare(results, baseline)
+        self.assertEqual(len(regressions), 2)
+        self.assertTrue(regressions[0].startswith('main'))
+        self.assertTrue(regressions[1].startswith('cart'))
+
+    def test_command_checks_scenarios_and_saves_query_counts(self):
+        with self.assertRaisesMessage(CommandError, 'Unknown scenarios: nowhere'):
+            call_command('benchmark', 'main', 'nowhere', stdout=StringIO())
+        generate(users=3, categories=1, items=10, reviews=10, orders=5, guest_carts=1)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'baseline.json')
+            call_command('benchmark', 'main', '--repeat=1', f'--baseline={path}', '--save-baseline',
+                         stdout=StringIO())
+            self.assertEqual(set(benchmark.load_baseline(path)['main']), {'queries', 'status'})
+
+    def test_missing_data_is_reported(self):
+        with self.assertRaises(ValueError):
+            benchmark.run(repeat=1)
@@ -0,0 +1,104 @@
+from django.contrib.auth import get_user
+from django.contrib.auth.models import AnonymousUser, User
+from django.core.cache import cache
+from django.test import RequestFactory, TestCase
+from django.utils.functional import SimpleLazyObject
+
+from market.cache import (get_active_categories, get_request_profile,
+                          get_session_profile_ids)
+from market.middleware import CurrentProfileMiddleware
+from market.models import Item_category
+from market.tests.utils import PASSWORD, create_profile
+
+
+class HeaderCacheTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        Item_category.objects.create(name='Phones')
+        Item_category.objects.create(name='Books')
+        Item_category.objects.create(name='Hidden', status=False)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_categories_are_cached(self):
+        with self.assertNumQueries(1):
+            get_active_categories()
+            categories = get_active_categories()
+        self.assertEqual(categories['names'], ['Books', 'Phones'])
+        self.assertEqual(categories['default'], 'Phones')
+
+    def test_category_change_drops_cache(self):
+        get_active_categories()
+        category = Item_category.objects.get(name='Hidden')
+        category.status = True
+        category.save()
+        self.assertIn('Hidden', get_active_categories()['names'])
+        category.delete()
+        self.assertNotIn('Hidden', get_active_categories()['names'])
+
+
+class RequestProfileTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.profile = create_profile()
+        cls.user = cls.profile.user
+        cls.cart = cls.profile.cart
+
+    def make_request(self, user=None, session=None):
+        request = RequestFactory().get('/')
+        request.user = User.objects.get(id=(user or self.user).id)
+        request.session = session or self.client.session
+        CurrentProfileMiddleware(lambda request: None).process_view(request, lambda request: None, (), {})
+        return request
+
+    def test_profile_and_cart_take_one_query(self):
+        session = self.client.session
+        self.make_request(session=session)
+        request = self.make_request(session=session)
+        with self.assertNumQueries(1):
+            self.assertEqual(request.profile.id, self.profile.id)
+            self.assertEqual(request.cart.id, self.cart.id)
+            self.assertEqual(request.profile.user.username, 'buyer')
+            get_request_profile(request)
+
+    def test_ids_are_kept_in_session(self):
+        session = self.client.session
+        request = self.make_request(session=session)
+        with self.assertNumQueries(0):
+            self.assertEqual(get_session_profile_ids(request), (self.profile.id, self.cart.id))
+            CurrentProfileMiddleware(lambda request: None).process_view(request, lambda request: None, (), {})
+
+    def test_ids_reuse_loaded_profile(self):
+        request = RequestFactory().get('/')
+        request.user = self.user
+        request.session = self.client.session
+        get_request_profile(request)
+        with self.assertNumQueries(0):
+            self.assertEqual(get_session_profile_ids(request), (self.profile.id, self.cart.id))
+
+    def test_users_without_profile_get_none(self):
+        user = User.objects.create_user(username='staff', password=PASSWORD)
+        request = self.make_request(user)
+        self.assertIs(request.profile, None)
+        self.assertIs(request.cart, None)
+
+    def test_guests_have_no_profile(self):
+        request = RequestFactory().get('/')
+        request.user = AnonymousUser()
+        CurrentProfileMiddleware(lambda request: None).process_view(request, lambda request: None, (), {})
+        self.assertIs(request.profile, None)
+        self.assertIs(request.cart, None)
+
+    def test_sessionless_views_do_not_touch_session(self):
+        request = RequestFactory().get('/')
+        request.session = self.client.session
+        request.user = SimpleLazyObject(lambda: get_user(request))
+        request.session.accessed = False
+        view = lambda request: None
+        view.sessionless = True
+        CurrentProfileMiddleware(lambda request: None).process_view(request, view, (), {})
+        self.assertIsNone(request.profile)
+        self.assertFalse(request.session.accessed)
@@ -0,0 +1,154 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from market.carts import (add_item, change_quantity, clear_cart,
+                          guest_cart_total, inconsistent_carts,
+                          reconcile_carts, remove_line, set_quantity)
+from market.models import Cart, Item, Item_in_cart, Item_in_unauthorized_cart
+from market.tests.utils import create_profile
+
+
+class CartServiceTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.cart = create_profile().cart
+        cls.phone = Item.objects.create(name='Phone', price=100)
+        cls.case = Item.objects.create(name='Case', price=15)
+
+    def cart_price(self):
+        return Cart.objects.get(id=self.cart.id).cart_price
+
+    def test_add_item_takes_two_queries(self):
+        with self.assertNumQueries(2):
+            add_item(self.phone.id, 2, cart_id=self.cart.id)
+        with self.assertNumQueries(2):
+            add_item(self.phone.id, 1, cart_id=self.cart.id)
+        line = Item_in_cart.objects.get(cart=self.cart)
+        self.assertEqual(line.quantity, 3)
+        self.assertEqual(self.cart_price(), 300)
+
+    def test_quantity_changes_keep_total(self):
+        add_item(self.phone.id, 2, cart_id=self.cart.id)
+        add_item(self.case.id, 4, cart_id=self.cart.id)
+        phone_line = Item_in_cart.objects.get(item=self.phone)
+        case_line = Item_in_cart.objects.get(item=self.case)
+        with self.assertNumQueries(2):
+            change_quantity(phone_line.id, 3, cart_id=self.cart.id)
+        self.assertEqual(self.cart_price(), 5 * 100 + 4 * 15)
+        with self.assertNumQueries(2):
+            set_quantity(case_line.id, 1, cart_id=self.cart.id)
+        self.assertEqual(self.cart_price(), 5 * 100 + 15)
+        with self.assertNumQueries(2):
+            change_quantity(phone_line.id, -2, cart_id=self.cart.id)
+        self.assertEqual(Item_in_cart.objects.get(id=phone_line.id).quantity, 3)
+        self.assertEqual(self.cart_price(), 3 * 100 + 15)
+        with self.assertNumQueries(3):
+            change_quantity(phone_line.id, -10, cart_id=self.cart.id)
+        self.assertFalse(Item_in_cart.objects.filter(id=phone_line.id).exists())
+        self.assertEqual(self.cart_price(), 15)
+        with self.assertNumQueries(2):
+            remove_line(case_line.id, cart_id=self.cart.id)
+        self.assertEqual(self.cart_price(), 0)
+
+    def test_foreign_line_is_not_touched(self):
+        add_item(self.phone.id, 1, session_key='42')
+        line = Item_in_unauthorized_cart.objects.get(session_key='42')
+        remove_line(line.id, cart_id=self.cart.id)
+        change_quantity(line.id, 5, session_key='43')
+        line.refresh_from_db()
+        self.assertEqual(line.quantity, 1)
+        self.assertEqual(self.cart_price(), 0)
+
+    def test_guest_cart(self):
+        add_item(self.phone.id, 1, session_key=42)
+        add_item(self.phone.id, 2, session_key='42')
+        line = Item_in_unauthorized_cart.objects.get(session_key='42')
+        self.assertEqual(line.quantity, 3)
+        change_quantity(line.id, -1, session_key='42')
+        line.refresh_from_db()
+        self.assertEqual(line.quantity, 2)
+
+
+class CartTotalTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.carts = [create_profile(f'buyer{num}').cart for num in range(3)]
+        cls.phone = Item.objects.create(name='Phone', price=100)
+
+    def test_line_delete_subtracts_its_whole_price(self):
+        add_item(self.phone.id, 3, cart_id=self.carts[0].id)
+        Item_in_cart.objects.get(cart=self.carts[0]).delete()
+        self.assertEqual(Cart.objects.get(id=self.carts[0].id).cart_price, 0)
+
+    def test_reconcile_fixes_drifted_totals(self):
+        add_item(self.phone.id, 2, cart_id=self.carts[0].id)
+        add_item(self.phone.id, 1, cart_id=self.carts[1].id)
+        Cart.objects.filter(id=self.carts[0].id).update(cart_price=7)
+        Cart.objects.filter(id=self.carts[2].id).update(cart_price=50)
+        self.assertEqual(inconsistent_carts().count(), 2)
+        with self.assertNumQueries(1):
+            self.assertEqual(reconcile_carts(), 2)
+        self.assertEqual([cart.cart_price for cart in Cart.objects.order_by('id')], [200, 100, 0])
+        self.assertFalse(inconsistent_carts().exists())
+
+
+class GuestCartTotalTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.items = [Item.objects.create(name=f'Item {num}', price=10 * (num + 1)) for num in range(5)]
+
+    def setUp(self):
+        cache.clear()
+
+    def test_total_counts_quantities_and_is_cached(self):
+        add_item(self.items[0].id, 3, session_key='42')
+        add_item(self.items[1].id, 1, session_key='42')
+        with self.assertNumQueries(1):
+            self.assertEqual(guest_cart_total('42'), 3 * 10 + 20)
+            self.assertEqual(guest_cart_total('42'), 3 * 10 + 20)
+        add_item(self.items[2].id, 2, session_key='42')
+        self.assertEqual(guest_cart_total('42'), 3 * 10 + 20 + 2 * 30)
+        item = self.items[0]
+        item.price = 5
+        item.save()
+        self.assertEqual(guest_cart_total('42'), 3 * 5 + 20 + 2 * 30)
+
+    def test_cart_page_query_count_does_not_depend_on_lines(self):
+        self.client.get(reverse('cart'))
+        session_key = self.client.session['session_key']
+        add_item(self.items[0].id, 1, session_key=session_key)
+        with CaptureQueriesContext(connection) as one_line:
+            self.client.get(reverse('cart'))
+        for item in self.items[1:]:
+            add_item(item.id, 1, session_key=session_key)
+        with CaptureQueriesContext(connection) as many_lines:
+            response = self.client.get(reverse('cart'))
+        self.assertEqual(len(one_line), len(many_lines))
+        self.assertEqual(response.context['price'], 150)
+
+
+class ClearCartTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.cart = create_profile().cart
+        cls.items = [Item.objects.create(name=f'Item {num}', price=10) for num in range(10)]
+
+    def test_clear_takes_two_queries(self):
+        for item in self.items:
+            add_item(item.id, 2, cart_id=self.cart.id)
+            add_item(item.id, 1, session_key='42')
+        with self.assertNumQueries(2):
+            clear_cart(cart_id=self.cart.id)
+        self.assertFalse(Item_in_cart.objects.exists())
+        self.assertEqual(Cart.objects.get(id=self.cart.id).cart_price, 0)
+        with self.assertNumQueries(1):
+            clear_cart(session_key='42')
+        self.assertFalse(Item_in_unauthorized_cart.objects.exists())
+        self.assertEqual(guest_cart_total('42'), 0)
@@ -0,0 +1,113 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from market.catalogue import (catalogue_page_key, get_catalogue_version,
+                              invalidate_catalogue, normalize_filters)
+from market.images import update_derivatives
+from market.models import (Item, Item_category, Item_image,
+                           Item_in_unauthorized_cart)
+
+
+class CataloguePageCacheTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.phones = Item_category.objects.create(name='Phones')
+        cls.books = Item_category.objects.create(name='Books')
+        cls.phone = Item.objects.create(name='Phone', price=100, category=cls.phones)
+        cls.book = Item.objects.create(name='Book', price=10, category=cls.books)
+
+    def setUp(self):
+        cache.clear()
+        self.url = reverse('catalogue')
+
+    def get(self, category, **filters):
+        return self.client.get(self.url, {'category_query': category, **filters})
+
+    def assertCached(self, category, **filters):
+        with self.assertNumQueries(0):
+            return self.get(category, **filters)
+
+    def assertNotCached(self, category, **filters):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.get(category, **filters)
+        self.assertTrue(any('FROM "market_item"' in query['sql'] for query in queries.captured_queries))
+        return response
+
+    def test_hot_pages_are_served_from_cache(self):
+        self.get('Phones')
+        response = self.assertCached('Phones')
+        self.assertContains(response, 'Phone')
+        self.assertContains(response, 'csrfmiddlewaretoken')
+
+    def test_equal_filters_share_the_page(self):
+        self.get('Phones', min_price='', item_query='  ', sort='unknown')
+        self.assertCached('Phones')
+        self.assertCached('Phones', max_price='nonsense')
+        self.assertNotEqual(normalize_filters({'min_price': '5'}), normalize_filters({}))
+
+    def test_language_is_part_of_the_key(self):
+        filters = normalize_filters({})
+        self.assertNotEqual(catalogue_page_key(self.phones.id, filters, 'ru'),
+                            catalogue_page_key(self.phones.id, filters, 'en'))
+
+    def test_price_edit_invalidates_only_its_category(self):
+        self.get('Phones')
+        self.get('Books')
+        self.book.price = 15
+        self.book.save()
+        self.assertCached('Phones')
+        self.assertContains(self.assertNotCached('Books'), '15$')
+
+    def test_moved_item_invalidates_both_categories(self):
+        self.get('Phones')
+        self.get('Books')
+        item = Item.objects.get(id=self.book.id)
+        item.category = self.phones
+        item.save()
+        link = f'href="catalogue/{self.book.id}"'
+        self.assertContains(self.assertNotCached('Phones'), link)
+        self.assertNotContains(self.assertNotCached('Books'), link)
+
+    def test_image_and_category_changes_invalidate(self):
+        self.get('Phones')
+        self.get('Books')
+        Item_image.objects.create(item=self.phone, image='item_images/phone.png')
+        self.assertContains(self.assertNotCached('Phones'), 'item_images/phone.png')
+        self.phones.status = False
+        self.phones.save()
+        self.assertNotCached('Phones')
+        self.assertCached('Books')
+
+    def test_derivatives_update_invalidates(self):
+        image = Item_image.objects.create(item=self.phone, image='item_images/missing.png')
+        self.get('Phones')
+        update_derivatives(image)
+        self.assertNotCached('Phones')
+
+    def test_version_is_not_reused_after_eviction(self):
+        version = get_catalogue_version(self.phones.id)
+        cache.delete(f'market:catalogue:version:{self.phones.id}')
+        invalidate_catalogue(self.phones.id)
+        self.assertNotEqual(get_catalogue_version(self.phones.id), version)
+
+    @override_settings(CATALOGUE_PAGE_SIZE=1)
+    def test_next_page_link_uses_normalized_filters(self):
+        Item.objects.create(name='Second phone', price=200, category=self.phones)
+        response = self.get('Phones', utm_source='mail', min_price='', item_query='  ')
+        next_page = response.context['next_page']
+        self.assertNotIn('utm_source', next_page)
+        self.assertNotIn('min_price', next_page)
+        self.assertIn('sort=name', next_page)
+        response = self.assertCached('Phones', utm_source='other')
+        self.assertEqual(response.context['next_page'], next_page)
+        self.assertContains(self.client.get(f'{self.url}?{next_page}'), 'Second phone')
+
+    def test_add_to_cart_form(self):
+        self.get('Phones')
+        self.client.post(f'{self.url}?category_query=Phones',
+                         {'add_to_cart': '1', 'item_added': self.phone.id})
+        self.assertEqual(Item_in_unauthorized_cart.objects.get().item_id, self.phone.id)
@@ -0,0 +1,128 @@
+import io
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.template import Context, Template
+from django.test import TestCase, override_settings
+from PIL import Image
+
+from market.images import attach_primary_images, update_derivatives
+from market.models import Item, Item_image, Profile
+from market.tests.utils import create_profile
+
+
+class PrimaryImageTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.items = [Item.objects.create(name=f'Item {num}') for num in range(5)]
+        for item in cls.items[:3]:
+            Item_image.objects.create(item=item, image=f'item_images/{item.id}_1.png')
+            Item_image.objects.create(item=item, image=f'item_images/{item.id}_2.png')
+
+    def test_first_image_is_attached_with_one_query(self):
+        items = list(Item.objects.filter(id__in=[item.id for item in self.items]))
+        with self.assertNumQueries(1):
+            attach_primary_images(items)
+        for item in items[:3]:
+            self.assertEqual(item.primary_image.image.name, f'item_images/{item.id}_1.png')
+        for item in items[3:]:
+            self.assertIsNone(item.primary_image)
+
+
+def png_file(name='picture.png', size=(640, 480), mode='RGB', color='red'):
+    buffer = io.BytesIO()
+    Image.new(mode, size, color).save(buffer, 'PNG')
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/png')
+
+
+class ImageDerivativesTest(TestCase):
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.item = Item.objects.create(name='Item')
+
+    def test_every_size_is_rendered_in_webp_and_fallback_format(self):
+        image = Item_image.objects.create(item=self.item, image=png_file())
+        derivatives = update_derivatives(image)
+        self.assertEqual(set(derivatives), set(settings.IMAGE_DERIVATIVES['item_image']))
+        for label, size in settings.IMAGE_DERIVATIVES['item_image'].items():
+            with default_storage.open(derivatives[label]['webp']) as file:
+                webp = Image.open(file)
+                self.assertEqual((webp.format, webp.size), ('WEBP', size))
+            with default_storage.open(derivatives[label]['fallback']) as file:
+                self.assertEqual(Image.open(file).format, 'JPEG')
+        image.refresh_from_db()
+        self.assertEqual(image.derivatives, derivatives)
+
+    def test_names_depend_on_content_only(self):
+        first = update_derivatives(Item_image.objects.create(item=self.item, image=png_file()))
+        second = update_derivatives(Item_image.objects.create(item=self.item, image=png_file()))
+        self.assertEqual(first['thumb']['webp'].rsplit('.', 2)[1], second['thumb']['webp'].rsplit('.', 2)[1])
+        other = update_derivatives(Item_image.objects.create(item=self.item, image=png_file(color='blue')))
+        self.assertNotEqual(first['thumb']['webp'].rsplit('.', 2)[1], other['thumb']['webp'].rsplit('.', 2)[1])
+
+    def test_transparent_images_fall_back_to_png(self):
+        image = Item_image.objects.create(item=self.item, image=png_file(mode='RGBA'))
+        derivatives = update_derivatives(image)
+        self.assertTrue(derivatives['thumb']['fallback'].endswith('.png'))
+
+    def test_broken_file_has_no_derivatives(self):
+        broken = SimpleUploadedFile('broken.png', b'not an image', content_type='image/png')
+        image = Item_image.objects.create(item=self.item, image=broken)
+        self.assertEqual(update_derivatives(image), {})
+
+    def test_backfill_renders_only_missing_derivatives(self):
+        images = [Item_image.objects.create(item=self.item, image=png_file()) for _ in range(3)]
+        update_derivatives(images[0])
+        profile = create_profile(tel='1', cart=False, avatar=png_file('avatar.png'))
+        out = io.StringIO()
+        call_command('build_image_derivatives', workers=2, batch_size=2, stdout=out)
+        self.assertIn('Derivatives of 3 images rendered', out.getvalue())
+        self.assertFalse(Item_image.objects.filter(derivatives={}).exists())
+        self.assertIn('avatar', Profile.objects.get(id=profile.id).avatar_derivatives)
+
+    def test_new_source_removes_previous_derivatives(self):
+        profile = create_profile(tel='1', cart=False, avatar=png_file('avatar.png'))
+        old = update_derivatives(profile)['avatar']
+        profile.avatar = png_file('avatar.png', color='blue')
+        profile.save()
+        new = update_derivatives(profile)['avatar']
+        self.assertFalse(any(default_storage.exists(name) for name in old.values()))
+        self.assertTrue(all(default_storage.exists(name) for name in new.values()))
+
+    def test_forced_backfill_removes_replaced_derivatives(self):
+        image = Item_image.objects.create(item=self.item, image=png_file())
+        old = update_derivatives(image)['thumb']['webp']
+        Item_image.objects.filter(id=image.id).update(image=default_storage.save('item_images/new.png',
+                                                                                 png_file(color='blue')))
+        call_command('build_image_derivatives', workers=1, force=True, stdout=io.StringIO())
+        image.refresh_from_db()
+        self.assertFalse(default_storage.exists(old))
+        self.assertTrue(default_storage.exists(image.derivatives['thumb']['webp']))
+
+    @override_settings(IMAGE_DERIVATIVES={'item_image': {'thumb': (100, 100)}})
+    def test_backfill_skips_kinds_without_sizes(self):
+        Item_image.objects.create(item=self.item, image=png_file())
+        create_profile(tel='1', cart=False, avatar=png_file('avatar.png'))
+        out = io.StringIO()
+        call_command('build_image_derivatives', workers=1, stdout=out)
+        self.assertIn('Derivatives of 1 images rendered', out.getvalue())
+        self.assertNotIn('missing', out.getvalue())
+
+    def test_picture_tag_prefers_derivatives(self):
+        image = Item_image.objects.create(item=self.item, image=png_file())
+        template = Template("{% load pictures %}{% picture image.image image.derivatives 'thumb' alt='img' %}")
+        self.assertIn(f'src="{image.image.url}"', template.render(Context({'image': image})))
+        derivatives = update_derivatives(image)
+        html = template.render(Context({'image': image}))
+        self.assertIn(f'srcset="{default_storage.url(derivatives["thumb"]["webp"])}" type="image/webp"', html)
+        self.assertIn(f'src="{default_storage.url(derivatives["thumb"]["fallback"])}"', html)
@@ -1 +1,40 @@
+from io import StringIO
+
+from django.core.management import call_command
 from django.test import TestCase
+
+from market.models import Item, Review
+from market.tests.utils import create_profile
+
+
+class ReviewCounterTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.profile = create_profile('author', cart=False)
+        cls.item = Item.objects.create(name='Phone')
+
+    def counters(self):
+        item = Item.objects.get(id=self.item.id)
+        return item.number_of_reviews, item.has_reviews
+
+    def test_counter_changes_only_on_insert_and_delete(self):
+        first = Review.objects.create(item=self.item, author=self.profile, description='Good')
+        second = Review.objects.create(item=self.item, author=self.profile, description='Bad')
+        self.assertEqual(self.counters(), (2, True))
+        first.description = 'Very good'
+        first.save()
+        self.assertEqual(self.counters(), (2, True))
+        first.delete()
+        self.assertEqual(self.counters(), (1, True))
+        second.delete()
+        self.assertEqual(self.counters(), (0, False))
+
+    def test_recount_command(self):
+        Review.objects.create(item=self.item, author=self.profile, description='Good')
+        other = Item.objects.create(name='Case', number_of_reviews=5, has_reviews=True)
+        Item.objects.filter(id=self.item.id).update(number_of_reviews=7)
+        call_command('recount_reviews', stdout=StringIO())
+        self.assertEqual(self.counters(), (1, True))
+        other.refresh_from_db()
+        self.assertEqual((other.number_of_reviews, other.has_reviews), (0, False))
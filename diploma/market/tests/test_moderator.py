@@ -0,0 +1,165 @@
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from market.models import (Item, Item_category, Order, Profile,
+                           Unauthorised_order)
+from market.pagination import encode_cursor
+from market.tests.utils import PASSWORD, create_profile
+
+
+class ModeratorListTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        create_profile('moderator', tel='9007654321', cart=False, admin=True)
+        cls.category = Item_category.objects.create(name='Phones')
+
+    def setUp(self):
+        self.client.login(username='moderator', password=PASSWORD)
+
+    def add_rows(self, number):
+        start = Order.objects.count()
+        for position in range(start, start + number):
+            user = User.objects.create_user(username=f'buyer_{position:03}')
+            profile = Profile.objects.create(user=user, tel='9001234567')
+            Order.objects.create(profile=profile, tel='9001234567', price=position)
+            Unauthorised_order.objects.create(session_key=str(position), tel='0', price=position)
+            Item.objects.create(name=f'Phone {position:03}', category=self.category, price=position)
+            Item_category.objects.create(name=f'Category {position:03}')
+
+    def count_queries(self, url):
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_queries_do_not_grow_with_rows(self):
+        urls = [reverse(name) for name in ('moderator_users', 'moderator_orders',
+                                           'moderator_products', 'moderator_categories')]
+        self.add_rows(2)
+        few = [self.count_queries(url) for url in urls]
+        self.add_rows(60)
+        self.assertEqual([self.count_queries(url) for url in urls], few)
+
+    def test_pages_follow_the_sort_order(self):
+        with self.settings(MODERATOR_PAGE_SIZE=2):
+            self.add_rows(3)
+            response = self.client.get(reverse('moderator_orders'), {'sort': 'price'})
+            self.assertEqual([order.price for order in response.context['orders']], [2, 1])
+            response = self.client.get(f'{reverse("moderator_orders")}?{response.context["next_page"]}')
+            self.assertEqual([order.price for order in response.context['orders']], [0])
+            self.assertIsNone(response.context['next_page'])
+            self.assertEqual(len(response.context['unauth_orders']), 2)
+
+    def test_category_search_is_paged(self):
+        with self.settings(MODERATOR_PAGE_SIZE=2):
+            self.add_rows(3)
+            url = reverse('moderator_categories')
+            response = self.client.get(url, {'q': 'category'})
+            self.assertEqual([category.name for category in response.context['categories']],
+                             ['Category 000', 'Category 001'])
+            response = self.client.get(f'{url}?{response.context["next_page"]}')
+            self.assertEqual([category.name for category in response.context['categories']],
+                             ['Category 002'])
+            self.assertIsNone(response.context['next_page'])
+
+    def test_tampered_cursors_show_the_first_page(self):
+        self.add_rows(2)
+        cursor = encode_cursor([{'x': 1}, 1])
+        for name, params in (('moderator_orders', {'sort': 'price', 'after': cursor}),
+                             ('moderator_orders', {'guest_after': cursor}),
+                             ('moderator_products', {'sort': 'price', 'after': cursor}),
+                             ('moderator_users', {'after': encode_cursor(['buyer', 2 ** 70])}),
+                             ('moderator_categories', {'after': cursor})):
+            with self.subTest(name=name, params=params):
+                response = self.client.get(reverse(name), params)
+                self.assertEqual(response.status_code, 200)
+
+    def test_users_are_sorted_by_name(self):
+        self.add_rows(3)
+        response = self.client.get(reverse('moderator_users'))
+        names = [profile.user.username for profile in response.context['profiles']]
+        self.assertEqual(names, sorted(names))
+
+    def test_unknown_sort_falls_back_to_default(self):
+        self.add_rows(2)
+        response = self.client.get(reverse('moderator_products'), {'sort': 'description'})
+        self.assertEqual(response.context['sort_type'], 'name')
+        self.assertEqual([item.name for item in response.context['items']], ['Phone 000', 'Phone 001'])
+
+
+class ModeratorSearchTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        create_profile('moderator', tel='9007654321', cart=False, admin=True)
+        user = User.objects.create_user(username='anna', email='anna@example.com')
+        cls.profile = Profile.objects.create(user=user, tel='9001112233')
+        cls.order = Order.objects.create(profile=cls.profile, tel='9001112233')
+        cls.guest_order = Unauthorised_order.objects.create(session_key='42', tel='9001112233',
+                                                            name='Guest Anna')
+        cls.phones = Item_category.objects.create(name='Anna phones')
+        cls.books = Item_category.objects.create(name='Books')
+        cls.phone = Item.objects.create(name='Phone for Anna', category=cls.phones)
+        cls.book = Item.objects.create(name='Anna Karenina', category=cls.books)
+
+    def setUp(self):
+        self.client.login(username='moderator', password=PASSWORD)
+
+    def search(self, **params):
+        return self.client.get(reverse('moderator_search'), params).context
+
+    def test_one_query_finds_every_entity(self):
+        context = self.search(q='anna')
+        self.assertEqual(list(context['users']), [self.profile])
+        self.assertEqual(list(context['orders']), [self.order])
+        self.assertEqual(list(context['guest_orders']), [self.guest_order])
+        self.assertEqual({item.id for item in context['products']}, {self.phone.id, self.book.id})
+
+    def test_guest_orders_are_found_by_phone(self):
+        context = self.search(q='1112233')
+        self.assertEqual(list(context['guest_orders']), [self.guest_order])
+        self.assertEqual(list(context['orders']), [self.order])
+
+    def test_products_are_searched_instead_of_categories(self):
+        context = self.search(q='karenina')
+        self.assertEqual([item.id for item in context['products']], [self.book.id])
+
+    def test_search_within_category(self):
+        context = self.search(q='anna', category=self.books.id)
+        self.assertEqual([item.id for item in context['products']], [self.book.id])
+        self.assertNotIn('users', context)
+
+    def test_numbers_and_cursors_out_of_range(self):
+        context = self.search(q='99999999999999999999999')
+        self.assertEqual(list(context['orders']), [])
+        context = self.search(q='²')
+        self.assertEqual(list(context['orders']), [])
+        context = self.search(q='anna', products_after=encode_cursor([{'x': 1}, 1]))
+        self.assertEqual({item.id for item in context['products']}, {self.phone.id, self.book.id})
+        self.assertEqual(list(self.search(q=str(self.order.id))['orders']), [self.order])
+
+    def test_each_entity_costs_one_query(self):
+        self.search(q='anna')
+        with CaptureQueriesContext(connection) as few:
+            self.search(q='anna')
+        for number in range(5):
+            Order.objects.create(profile=self.profile, tel='9001112233')
+        with CaptureQueriesContext(connection) as many:
+            context = self.search(q='anna')
+        self.assertEqual(len(context['orders']), 6)
+        self.assertEqual(len(few), len(many))
+
+    def test_hits_are_paginated(self):
+        for number in range(3):
+            Order.objects.create(profile=self.profile, tel='9001112233')
+        with self.settings(MODERATOR_PAGE_SIZE=2):
+            context = self.search(q='anna')
+            self.assertEqual(len(context['orders']), 2)
+            response = self.client.get(f'{reverse("moderator_search")}?{context["orders_next_page"]}')
+            self.assertEqual(len(response.context['orders']), 2)
+            self.assertEqual(len(response.context['users']), 1)
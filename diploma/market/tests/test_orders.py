@@ -0,0 +1,118 @@
+import datetime
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from market.carts import add_item
+from market.models import (Cart, Item, Item_in_cart, Item_in_order,
+                           Item_in_unauthorised_order,
+                           Item_in_unauthorized_cart, Order,
+                           Unauthorised_order)
+from market.orders import build_order, merge_guest_data
+from market.tests.utils import create_profile
+
+
+class BuildOrderTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.profile = create_profile()
+        cls.cart = cls.profile.cart
+        cls.items = [Item.objects.create(name=f'Item {num}', price=10 * (num + 1)) for num in range(20)]
+
+    def test_order_costs_constant_queries(self):
+        for item in self.items:
+            add_item(item.id, 2, cart_id=self.cart.id)
+        # savepoint, cart snapshot, draft lookup, order, order lines, savepoint release
+        with self.assertNumQueries(6):
+            order, lines = build_order(profile=self.profile)
+        self.assertEqual(len(lines), 20)
+        self.assertEqual(order.price, sum(2 * item.price for item in self.items))
+        self.assertEqual(Item_in_order.objects.filter(order=order).count(), 20)
+
+    def test_guest_order(self):
+        add_item(self.items[0].id, 3, session_key='42')
+        order, lines = build_order(session_key='42')
+        self.assertEqual(order.price, 30)
+        self.assertEqual(Item_in_unauthorised_order.objects.get(order=order).quantity, 3)
+
+    def test_empty_cart(self):
+        self.assertEqual(build_order(session_key='43'), (None, []))
+
+    def test_reload_reuses_draft(self):
+        add_item(self.items[0].id, 1, cart_id=self.cart.id)
+        order, _ = build_order(profile=self.profile)
+        again, lines = build_order(profile=self.profile)
+        self.assertEqual(order.id, again.id)
+        self.assertEqual(len(lines), 1)
+        add_item(self.items[1].id, 1, cart_id=self.cart.id)
+        updated, lines = build_order(profile=self.profile)
+        self.assertEqual(order.id, updated.id)
+        self.assertEqual(updated.price, 30)
+        self.assertEqual(Item_in_order.objects.filter(order=order).count(), 2)
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_paid_order_is_not_reused(self):
+        add_item(self.items[0].id, 1, cart_id=self.cart.id)
+        order, _ = build_order(profile=self.profile)
+        Order.objects.filter(id=order.id).update(payment_status=True)
+        new_order, _ = build_order(profile=self.profile)
+        self.assertNotEqual(order.id, new_order.id)
+
+    def test_purge_abandoned_drafts(self):
+        add_item(self.items[0].id, 1, cart_id=self.cart.id)
+        add_item(self.items[0].id, 1, session_key='42')
+        order, _ = build_order(profile=self.profile)
+        guest_order, _ = build_order(session_key='42')
+        week_ago = timezone.now() - datetime.timedelta(days=8)
+        Order.objects.filter(id=order.id).update(date_of_order=week_ago)
+        call_command('purge_draft_orders', days=7, stdout=StringIO())
+        self.assertFalse(Order.objects.filter(id=order.id).exists())
+        self.assertFalse(Item_in_order.objects.filter(order_id=order.id).exists())
+        self.assertTrue(Unauthorised_order.objects.filter(id=guest_order.id).exists())
+
+
+class MergeGuestDataTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.profile = create_profile()
+        cls.cart = cls.profile.cart
+        cls.items = [Item.objects.create(name=f'Item {num}', price=10 * (num + 1)) for num in range(10)]
+
+    def fill_guest_data(self, lines):
+        for item in self.items[:lines]:
+            add_item(item.id, 2, session_key='42')
+        build_order(session_key='42')
+        Unauthorised_order.objects.update(cart_hash=None)
+        build_order(session_key='42')
+
+    def merge_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            merge_guest_data('42', self.cart, self.profile)
+        return len(queries)
+
+    def test_cart_and_orders_are_moved(self):
+        add_item(self.items[0].id, 1, cart_id=self.cart.id)
+        self.fill_guest_data(3)
+        merge_guest_data('42', self.cart, self.profile)
+        quantities = dict(Item_in_cart.objects.filter(cart=self.cart).values_list('item_id', 'quantity'))
+        self.assertEqual(quantities, {self.items[0].id: 3, self.items[1].id: 2, self.items[2].id: 2})
+        self.assertEqual(Cart.objects.get(id=self.cart.id).cart_price, 3 * 10 + 2 * 20 + 2 * 30)
+        self.assertEqual(Order.objects.filter(profile=self.profile).count(), 2)
+        self.assertEqual(Item_in_order.objects.filter(order__profile=self.profile).count(), 6)
+        self.assertFalse(Unauthorised_order.objects.exists())
+        self.assertFalse(Item_in_unauthorised_order.objects.exists())
+        self.assertFalse(Item_in_unauthorized_cart.objects.exists())
+
+    def test_query_count_does_not_depend_on_lines(self):
+        self.fill_guest_data(2)
+        few = self.merge_queries()
+        Item_in_cart.objects.all().delete()
+        Order.objects.all().delete()
+        self.fill_guest_data(10)
+        self.assertEqual(self.merge_queries(), few)
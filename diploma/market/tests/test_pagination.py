@@ -0,0 +1,66 @@
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from market.models import Item, Item_category
+from market.pagination import encode_cursor, keyset_page
+
+
+class KeysetPaginationTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Item_category.objects.create(name='Phones')
+        for num in range(7):
+            Item.objects.create(name=f'Phone {num % 3}', price=10 * (num % 4), category=cls.category)
+
+    def walk(self, ordering):
+        seen, cursor = [], None
+        while True:
+            rows, cursor = keyset_page(Item.objects.all(), ordering, cursor, page_size=3)
+            seen.extend(rows)
+            if not cursor:
+                return seen
+
+    def test_pages_follow_ordering_with_duplicates(self):
+        for ordering in (('price', 'id'), ('name', 'id'), ('-price', '-id')):
+            expected = list(Item.objects.order_by(*ordering))
+            self.assertEqual(self.walk(ordering), expected)
+
+    def test_datetimes_with_microseconds(self):
+        moment = timezone.now().replace(microsecond=123456)
+        Item.objects.update(date_created=moment)
+        self.assertEqual(self.walk(('-date_created', '-id')), list(Item.objects.order_by('-id')))
+
+    def test_broken_cursor_starts_from_the_beginning(self):
+        rows, _ = keyset_page(Item.objects.all(), ('price', 'id'), 'garbage', page_size=3)
+        self.assertEqual(rows, list(Item.objects.order_by('price', 'id')[:3]))
+
+    def test_malformed_cursor_starts_from_the_beginning(self):
+        first_page = list(Item.objects.order_by('price', 'id')[:3])
+        for values in ([{'x': 1}, 1], [[10], 1], ['ten', 1], [10, None], [10, 99999999999999999999999]):
+            with self.subTest(values=values):
+                rows, _ = keyset_page(Item.objects.all(), ('price', 'id'), encode_cursor(values), page_size=3)
+                self.assertEqual(rows, first_page)
+
+    def test_malformed_cursor_in_catalogue(self):
+        cache.clear()
+        cursor = encode_cursor([{'x': 1}, 1])
+        for sort_type, query in (('price', ''), ('name', ''), ('relevance', 'phone')):
+            with self.subTest(sort=sort_type):
+                response = self.client.get(reverse('catalogue'), {'category_query': 'Phones', 'sort': sort_type,
+                                                                  'item_query': query, 'after': cursor})
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(len(response.context['items']), 7)
+
+    @override_settings(CATALOGUE_PAGE_SIZE=4)
+    def test_catalogue_is_sorted_and_paginated(self):
+        cache.clear()
+        url = reverse('catalogue')
+        response = self.client.get(url, {'category_query': 'Phones', 'sort': 'price'})
+        first_page = list(response.context['items'])
+        self.assertEqual(first_page, list(Item.objects.order_by('price', 'id')[:4]))
+        response = self.client.get(f"{url}?{response.context['next_page']}")
+        self.assertEqual(list(response.context['items']), list(Item.objects.order_by('price', 'id')[4:]))
+        self.assertIsNone(response.context['next_page'])
@@ -0,0 +1,120 @@
+import datetime
+from unittest import mock
+
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from market.models import Cart, Item, Item_in_cart, Order, Unauthorised_order
+from market.payments import (PAYMENT_ERROR, PAYMENT_FAILURE, _run_in_worker,
+                             settle_payment)
+from market.tests.utils import PASSWORD, create_profile
+
+
+class PaymentTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.profile = create_profile()
+        cls.cart = cls.profile.cart
+        cls.item = Item.objects.create(name='Phone', price=100)
+
+    def setUp(self):
+        Item_in_cart.objects.create(item=self.item, cart=self.cart, quantity=2)
+        Cart.objects.filter(id=self.cart.id).update(cart_price=200)
+        self.order = Order.objects.create(profile=self.profile, tel='9001234567', price=200)
+
+    @mock.patch('market.payments.payment_imitation', return_value=True)
+    def test_successful_payment_clears_cart(self, imitation):
+        self.assertTrue(settle_payment(Order, self.order.id, '12345678'))
+        self.order.refresh_from_db()
+        self.assertTrue(self.order.payment_status)
+        self.assertFalse(self.order.payment_pending)
+        self.assertFalse(Item_in_cart.objects.filter(cart=self.cart).exists())
+
+    @mock.patch('market.payments.payment_imitation', return_value=False)
+    def test_failed_payment_keeps_cart(self, imitation):
+        self.assertFalse(settle_payment(Order, self.order.id, '12345671'))
+        self.order.refresh_from_db()
+        self.assertFalse(self.order.payment_status)
+        self.assertEqual(self.order.error, PAYMENT_ERROR)
+        self.assertTrue(Item_in_cart.objects.filter(cart=self.cart).exists())
+
+    @mock.patch('market.payments.get_executor')
+    def test_payment_view_does_not_wait_for_settlement(self, get_executor):
+        self.client.login(username='buyer', password=PASSWORD)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('payment', kwargs={'pk': self.order.id}),
+                                        {'card_num': '12345678'})
+        self.assertRedirects(response,
+                             reverse('payment_status', kwargs={'pk': self.order.id}),
+                             fetch_redirect_response=False)
+        get_executor.return_value.submit.assert_called_once()
+        self.order.refresh_from_db()
+        self.assertTrue(self.order.payment_pending)
+
+    @mock.patch('market.payments.payment_imitation', return_value=True)
+    def test_guest_payment_clears_session_cart(self, imitation):
+        order = Unauthorised_order.objects.create(session_key='42', tel='0')
+        self.assertTrue(settle_payment(Unauthorised_order, order.id, '12345678'))
+        order.refresh_from_db()
+        self.assertTrue(order.payment_status)
+
+    @mock.patch('market.payments.connections')
+    @mock.patch('market.payments.payment_imitation', side_effect=RuntimeError('gateway is down'))
+    def test_crashed_payment_can_be_retried(self, imitation, connections):
+        Order.objects.filter(id=self.order.id).update(payment_pending=True, payment_started=timezone.now())
+        with self.assertLogs('market.payments', 'ERROR'):
+            self.assertFalse(_run_in_worker(Order, self.order.id, '12345678'))
+        self.order.refresh_from_db()
+        self.assertFalse(self.order.payment_status)
+        self.assertFalse(self.order.payment_pending)
+        self.assertEqual(self.order.error, PAYMENT_FAILURE)
+        connections.close_all.assert_called_once()
+
+    @mock.patch('market.payments.get_executor')
+    def test_lost_payment_is_failed_and_enqueued_again(self, get_executor):
+        started = timezone.now() - datetime.timedelta(minutes=10)
+        Order.objects.filter(id=self.order.id).update(payment_pending=True, payment_started=started)
+        self.client.login(username='buyer', password=PASSWORD)
+        response = self.client.get(reverse('payment_status', kwargs={'pk': self.order.id}))
+        self.assertRedirects(response, reverse('error', kwargs={'pk': self.order.id}),
+                             fetch_redirect_response=False)
+        self.order.refresh_from_db()
+        self.assertFalse(self.order.payment_pending)
+        Order.objects.filter(id=self.order.id).update(payment_pending=True, payment_started=started)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('payment', kwargs={'pk': self.order.id}), {'card_num': '12345678'})
+        get_executor.return_value.submit.assert_called_once()
+
+    def test_guest_orders_are_found_by_id_in_their_session(self):
+        session = self.client.session
+        session['session_key'] = 42
+        session.save()
+        first = Unauthorised_order.objects.create(session_key='42', tel='0', price=10)
+        Unauthorised_order.objects.create(session_key='42', tel='0', price=20)
+        other = Unauthorised_order.objects.create(session_key='43', tel='0')
+        response = self.client.post(reverse('order'), {
+            'order_id': first.id, 'tel': '9001112233', 'enter_name': 'Anna', 'address': 'Main st.',
+            'payment_method': 'card', 'delivery_method': 'in shop',
+        })
+        self.assertRedirects(response, reverse('payment', kwargs={'pk': first.id}),
+                             fetch_redirect_response=False)
+        self.assertEqual(Unauthorised_order.objects.get(id=first.id).name, 'Anna')
+        response = self.client.get(reverse('payment', kwargs={'pk': first.id}))
+        self.assertEqual(response.context['order'].id, first.id)
+        self.assertEqual(self.client.get(reverse('payment_status', kwargs={'pk': other.id})).status_code, 404)
+
+    def test_orders_of_other_users_are_not_found(self):
+        create_profile('other')
+        self.client.login(username='other', password=PASSWORD)
+        self.assertEqual(self.client.get(reverse('payment', kwargs={'pk': self.order.id})).status_code, 404)
+
+    @mock.patch('market.payments.payment_imitation', return_value=True)
+    def test_paid_order_is_not_settled_twice(self, imitation):
+        settle_payment(Order, self.order.id, '12345678')
+        self.item.refresh_from_db()
+        times_bought = self.item.times_bought
+        settle_payment(Order, self.order.id, '12345678')
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.times_bought, times_bought)
@@ -0,0 +1,90 @@
+import re
+from unittest import skipUnless
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from market.models import (Item, Item_category, Item_in_cart,
+                           Item_in_unauthorized_cart, Order)
+from market.tests.utils import PASSWORD, create_profile
+
+FULL_SCAN = re.compile(r'^SCAN (?:TABLE )?(market_\w+)(?!.*\bUSING\b)')
+
+
+@skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN is specific to SQLite')
+class QueryPlanTest(TestCase):
+
+    """Hot views must reach market tables through indexes only"""
+
+    @classmethod
+    def setUpTestData(cls):
+        create_profile('moderator', tel='9007654321', cart=False, admin=True)
+        cls.profile = create_profile()
+        cls.user = cls.profile.user
+        cart = cls.profile.cart
+        cls.category = Item_category.objects.create(name='Phones')
+        items = Item.objects.bulk_create([
+            Item(name=f'Phone {number}', category=cls.category, price=number + 1,
+                 has_reviews=bool(number % 2), limited=not number % 5)
+            for number in range(50)
+        ])
+        Item_in_cart.objects.create(cart=cart, item=items[0], quantity=1)
+        Order.objects.create(profile=cls.profile, tel='9001234567')
+
+    def setUp(self):
+        cache.clear()
+
+    def full_scans(self, queries):
+        scans = set()
+        with connection.cursor() as cursor:
+            for query in queries:
+                sql = query['sql']
+                if not sql.startswith('SELECT'):
+                    continue
+                cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+                plan = [row[-1] for row in cursor.fetchall()]
+                # A scan in the order of an ORDER BY ... LIMIT stops after one page
+                paged = ' LIMIT ' in sql and not any('TEMP B-TREE' in step for step in plan)
+                for step in plan:
+                    match = FULL_SCAN.match(step)
+                    if match and not paged:
+                        scans.add((match.group(1), sql))
+        return scans
+
+    def assertNoFullScans(self, url, data=None):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, data)
+        self.assertLess(response.status_code, 400)
+        scans = self.full_scans(queries.captured_queries)
+        self.assertFalse(scans, '\n'.join(f'{table}: {sql}' for table, sql in sorted(scans)))
+
+    def test_catalogue(self):
+        self.assertNoFullScans(reverse('catalogue'))
+        self.assertNoFullScans(reverse('catalogue'), {'category_query': 'Phones', 'sort': 'price',
+                                                      'min_price': 5, 'max_price': 30,
+                                                      'reviews_check': 'on'})
+
+    def test_main_page(self):
+        self.assertNoFullScans(reverse('main'))
+
+    def test_guest_cart_and_order(self):
+        self.client.get(reverse('cart'))
+        Item_in_unauthorized_cart.objects.create(session_key=self.client.session['session_key'],
+                                                 item=Item.objects.first(), quantity=1)
+        self.assertNoFullScans(reverse('cart'))
+        self.assertNoFullScans(reverse('order'))
+
+    def test_moderator_lists(self):
+        self.client.login(username='moderator', password=PASSWORD)
+        for name in ('moderator_users', 'moderator_orders', 'moderator_products', 'moderator_categories'):
+            for sort in ('', 'price', 'id'):
+                self.assertNoFullScans(reverse(name), {'sort': sort} if sort else None)
+
+    def test_user_cart_order_and_account(self):
+        self.client.login(username='buyer', password=PASSWORD)
+        self.assertNoFullScans(reverse('cart'))
+        self.assertNoFullScans(reverse('order'))
+        self.assertNoFullScans(reverse('account', args=[self.user.id]))
@@ -0,0 +1,74 @@
+import os
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from market.models import Item, Item_category
+from market.querystats import (percentile, read_samples, remove_samples, stats,
+                               summarize)
+
+
+@override_settings(QUERY_STATS=True)
+class QueryStatsTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        category = Item_category.objects.create(name='Phones')
+        cls.item = Item.objects.create(name='Phone', category=category)
+
+    def setUp(self):
+        stats.drain()
+        handle, self.path = tempfile.mkstemp(suffix='.jsonl')
+        os.close(handle)
+        self.addCleanup(remove_samples, self.path)
+
+    def test_requests_are_measured_per_view(self):
+        self.client.get(reverse('product', args=[self.item.id]))
+        self.client.get(reverse('product', args=[self.item.id]))
+        row = stats.summary()['product']
+        self.assertEqual(row['requests'], 2)
+        self.assertGreater(row['queries_p50'], 0)
+        self.assertGreater(row['template_ms_p99'], 0)
+        self.assertGreater(row['bytes_p50'], 0)
+
+    def test_flush_feeds_the_report_command(self):
+        with override_settings(QUERY_STATS_FILE=self.path):
+            self.client.get(reverse('main'))
+            report = stats.flush()
+            self.assertIn('main', report)
+            self.assertEqual(stats.summary(), {})
+            out = StringIO()
+            call_command('querystats', '--reset', stdout=out)
+        self.assertIn('main', out.getvalue())
+        self.assertEqual(read_samples(self.path), [])
+        self.assertFalse(os.path.exists(self.path))
+
+    @override_settings(QUERY_STATS_FLUSH_EVERY=2)
+    def test_samples_are_flushed_periodically(self):
+        with override_settings(QUERY_STATS_FILE=self.path):
+            self.client.get(reverse('main'))
+            self.client.get(reverse('main'))
+        self.assertEqual(len(read_samples(self.path)), 2)
+
+    @override_settings(QUERY_STATS_FLUSH_EVERY=1, QUERY_STATS_FILE_MAX_BYTES=1)
+    def test_file_is_rotated(self):
+        with override_settings(QUERY_STATS_FILE=self.path):
+            for _ in range(3):
+                self.client.get(reverse('main'))
+        self.assertEqual(len(read_samples(self.path)), 2)
+        with open(self.path) as stats_file:
+            self.assertEqual(len(stats_file.readlines()), 1)
+
+    @override_settings(QUERY_STATS=False)
+    def test_disabled(self):
+        self.client.get(reverse('main'))
+        self.assertEqual(stats.summary(), {})
+
+    def test_percentiles(self):
+        values = list(range(1, 101))
+        self.assertEqual([percentile(values, rank) for rank in (50, 95, 99)], [50, 95, 99])
+        report = summarize([{'view': 'main', 'queries': 3, 'sql_ms': 1, 'template_ms': 2, 'bytes': 10}])
+        self.assertEqual(report['main']['queries_p99'], 3)
@@ -0,0 +1,60 @@
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from market.models import Item, Review
+from market.reviews import review_page
+from market.tests.utils import create_profile
+
+
+class ProductReviewsTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.profile = create_profile('author', cart=False)
+        cls.item = Item.objects.create(name='Phone')
+
+    def add_reviews(self, number):
+        for position in range(number):
+            Review.objects.create(item=self.item, author=self.profile, description=f'Review {position}')
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_product_page_does_not_depend_on_number_of_reviews(self):
+        url = reverse('product', args=[self.item.id])
+        self.add_reviews(2)
+        self.count_queries(url)
+        few = self.count_queries(url)
+        self.add_reviews(30)
+        many = self.count_queries(url)
+        self.assertEqual(few, many)
+
+    def test_reviews_are_paginated_by_cursor(self):
+        self.add_reviews(5)
+        url = reverse('product_reviews', args=[self.item.id])
+        first = self.client.get(url, {'format': 'json'}).json()
+        self.assertEqual([review['description'] for review in first['reviews']],
+                         ['Review 0', 'Review 1', 'Review 2'])
+        self.assertEqual(first['reviews'][0]['author'], 'author')
+        second = self.client.get(url, {'format': 'json', 'after': first['next']}).json()
+        self.assertEqual([review['description'] for review in second['reviews']],
+                         ['Review 3', 'Review 4'])
+        self.assertIsNone(second['next'])
+
+    def test_fragment_links_to_next_page(self):
+        self.add_reviews(4)
+        response = self.client.get(reverse('product_reviews', args=[self.item.id]))
+        self.assertContains(response, 'Review 2')
+        self.assertNotContains(response, 'Review 3')
+        self.assertContains(response, 'class="more-reviews"')
+
+    def test_page_of_reviews_takes_one_query(self):
+        self.add_reviews(4)
+        with self.assertNumQueries(1):
+            reviews, _ = review_page(self.item.id)
+            [str(review.author) for review in reviews]
@@ -0,0 +1,63 @@
+from django.contrib.auth.models import Group
+from django.test import RequestFactory, TestCase
+
+from market.models import Profile
+from market.roles import ADMINS_GROUP, group_id, is_admin
+from market.tests.utils import PASSWORD, create_profile
+
+
+class RolesTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_profile(cart=False).user
+        cls.admins = Group.objects.get(name='Admins')
+        cls.users = Group.objects.get(name='Users')
+
+    def setUp(self):
+        self.profile = Profile.objects.get(user=self.user)
+        self.request = RequestFactory().get('/')
+        self.request.user = self.user
+        self.request.session = self.client.session
+
+    def test_new_profile_joins_users_group(self):
+        self.assertEqual(list(self.user.groups.all()), [self.users])
+
+    def test_save_without_flip_leaves_groups_alone(self):
+        self.profile.tel = '9007654321'
+        with self.assertNumQueries(1):
+            self.profile.save()
+
+    def test_flip_moves_user_between_groups(self):
+        self.profile.admin = True
+        self.profile.save()
+        self.assertEqual(list(self.user.groups.all()), [self.admins])
+        self.profile.admin = False
+        self.profile.save()
+        self.assertEqual(list(self.user.groups.all()), [self.users])
+
+    def test_admin_flag_is_kept_in_session(self):
+        group_id(ADMINS_GROUP)
+        with self.assertNumQueries(1):
+            self.assertFalse(is_admin(self.request))
+            self.assertFalse(is_admin(self.request))
+
+    def test_flag_follows_profile_changes(self):
+        self.assertFalse(is_admin(self.request))
+        self.profile.admin = True
+        self.profile.save()
+        self.assertTrue(is_admin(self.request))
+
+    def test_flag_follows_direct_membership_changes(self):
+        self.assertFalse(is_admin(self.request))
+        self.admins.user_set.add(self.user)
+        self.assertTrue(is_admin(self.request))
+        self.user.groups.remove(self.admins)
+        self.assertFalse(is_admin(self.request))
+
+    def test_moderator_pages_are_closed_to_users(self):
+        self.client.login(username='buyer', password=PASSWORD)
+        self.assertEqual(self.client.get('/moderator').status_code, 403)
+        self.profile.admin = True
+        self.profile.save()
+        self.assertEqual(self.client.get('/moderator').status_code, 200)
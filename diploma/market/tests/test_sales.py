@@ -0,0 +1,90 @@
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+
+from market.models import (Best_seller, Item, Item_category, Item_in_order,
+                           Item_in_unauthorised_order, Order,
+                           Unauthorised_order)
+from market.sales import (get_best_sellers, record_sales, recount_times_bought,
+                          refresh_rankings)
+from market.tests.utils import create_profile
+
+
+class BestSellersTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.phones = Item_category.objects.create(name='Phones')
+        cls.cases = Item_category.objects.create(name='Cases')
+        cls.phone = Item.objects.create(name='Phone', category=cls.phones, price=100)
+        cls.tablet = Item.objects.create(name='Tablet', category=cls.phones, price=200)
+        cls.case = Item.objects.create(name='Case', category=cls.cases, price=10)
+
+    def setUp(self):
+        cache.clear()
+
+    def pay(self, *lines):
+        order = Unauthorised_order.objects.create(session_key='42', tel='0', payment_status=True)
+        Item_in_unauthorised_order.objects.bulk_create([
+            Item_in_unauthorised_order(order=order, item=item, quantity=quantity)
+            for item, quantity in lines
+        ])
+        record_sales(order)
+        return order
+
+    def test_paid_order_updates_counters_and_ranking(self):
+        self.pay((self.phone, 1), (self.tablet, 3))
+        self.pay((self.phone, 1))
+        self.assertEqual(Item.objects.get(id=self.phone.id).times_bought, 2)
+        self.assertEqual(Item.objects.get(id=self.tablet.id).times_bought, 3)
+        self.assertEqual(get_best_sellers(self.phones.id), [self.tablet, self.phone])
+        self.assertEqual(get_best_sellers(self.cases.id), [])
+
+    def test_only_categories_of_sold_items_are_refreshed(self):
+        self.pay((self.case, 1))
+        with self.assertNumQueries(7):
+            self.pay((self.phone, 1))
+        self.assertEqual(Best_seller.objects.filter(category=self.cases).count(), 1)
+
+    def test_best_sellers_are_served_from_cache(self):
+        self.pay((self.phone, 2), (self.case, 1))
+        self.assertEqual(get_best_sellers(), [self.phone, self.case])
+        with self.assertNumQueries(0):
+            self.assertEqual(get_best_sellers(), [self.phone, self.case])
+
+    def test_inactive_items_are_hidden(self):
+        self.pay((self.phone, 2), (self.tablet, 1))
+        self.phone.status = False
+        self.phone.save()
+        self.assertEqual(get_best_sellers(self.phones.id), [self.tablet])
+
+    def test_refresh_command_recounts_from_paid_orders(self):
+        order = Unauthorised_order.objects.create(session_key='42', tel='0', payment_status=True)
+        Item_in_unauthorised_order.objects.create(order=order, item=self.case, quantity=4)
+        call_command('refresh_best_sellers', '--recount', stdout=StringIO())
+        self.assertEqual(Item.objects.get(id=self.case.id).times_bought, 4)
+        self.assertEqual(get_best_sellers(self.cases.id), [self.case])
+
+    def test_recount_is_one_update(self):
+        guest_order = Unauthorised_order.objects.create(session_key='42', tel='0', payment_status=True)
+        Item_in_unauthorised_order.objects.create(order=guest_order, item=self.case, quantity=4)
+        order = Order.objects.create(profile=create_profile(cart=False), tel='0', payment_status=True)
+        Item_in_order.objects.create(order=order, item=self.case, quantity=2)
+        Item_in_order.objects.create(order=order, item=self.phone, quantity=1)
+        unpaid = Order.objects.create(profile=order.profile, tel='0')
+        Item_in_order.objects.create(order=unpaid, item=self.tablet, quantity=5)
+        Item.objects.filter(id=self.tablet.id).update(times_bought=9)
+        with self.assertNumQueries(1):
+            self.assertEqual(recount_times_bought(), 3)
+        self.assertEqual(dict(Item.objects.values_list('name', 'times_bought')),
+                         {'Case': 6, 'Phone': 1, 'Tablet': 0})
+
+    def test_main_page_shows_best_sellers(self):
+        self.pay((self.tablet, 1))
+        self.assertContains(self.client.get(reverse('main')), 'Best sellers')
+
+    def test_refresh_rankings_ignores_missing_category(self):
+        self.assertEqual(refresh_rankings([None]), 0)
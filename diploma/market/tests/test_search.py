@@ -0,0 +1,81 @@
+import time
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+
+from market.models import Item
+from market.pagination import keyset_page
+from market.search import rebuild_index, search_items
+
+
+class SearchTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.phone = Item.objects.create(name='Smartphone', description='Black phone with a camera')
+        cls.camera = Item.objects.create(name='Camera', description='Mirrorless camera')
+        cls.book = Item.objects.create(name='Book', description='Novel about a photographer')
+
+    def test_prefix_match(self):
+        found = search_items(Item.objects.all(), 'smart')
+        self.assertEqual(list(found), [self.phone])
+
+    def test_results_are_ranked(self):
+        found = list(search_items(Item.objects.all(), 'camera'))
+        self.assertEqual(found, [self.camera, self.phone])
+
+    def test_index_follows_item_changes(self):
+        self.book.name = 'Photo album'
+        self.book.save()
+        self.assertEqual(list(search_items(Item.objects.all(), 'album')), [self.book])
+        self.camera.delete()
+        self.assertEqual(list(search_items(Item.objects.all(), 'mirrorless')), [])
+
+    def test_rebuild_command(self):
+        Item.objects.filter(id=self.book.id).update(name='Dictionary')
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertEqual(list(search_items(Item.objects.all(), 'dictionary')), [self.book])
+
+    def test_ranked_results_are_paged(self):
+        Item.objects.bulk_create([Item(name=f'Camera {number}') for number in range(5)])
+        rebuild_index()
+        found, cursor = [], None
+        while True:
+            rows, cursor = keyset_page(search_items(Item.objects.all(), 'camera'), ('search_rank', 'id'), cursor, 2)
+            found += rows
+            if cursor is None:
+                break
+        self.assertEqual(found, list(search_items(Item.objects.all(), 'camera')))
+        self.assertEqual(len(found), 7)
+
+    def ranking_time(self, matches):
+        """Best time of ranking every match of a query, only the first row is fetched"""
+        Item.objects.filter(name__startswith='Phone ').delete()
+        Item.objects.bulk_create([Item(name=f'Phone {number}') for number in range(matches)])
+        rebuild_index()
+        found = search_items(Item.objects.only('id'), 'phone')[:1]
+        timings = []
+        for _ in range(3):
+            start = time.perf_counter()
+            list(found.all())
+            timings.append(time.perf_counter() - start)
+        return min(timings)
+
+    def test_ranking_cost_grows_linearly(self):
+        small, large = self.ranking_time(400), self.ranking_time(3200)
+        # Eight times the matches, matching again for every row would take about sixty times longer
+        self.assertLess(large, small * 24)
+
+    def test_index_is_matched_once(self):
+        found = search_items(Item.objects.all(), 'camera')
+        with connection.cursor() as cursor:
+            sql, params = found.query.sql_with_params()
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+            plan = ' '.join(row[-1] for row in cursor.fetchall())
+        self.assertNotIn('CORRELATED', plan)
+
+    @override_settings(SEARCH_FTS=False)
+    def test_fallback_search(self):
+        self.assertEqual(list(search_items(Item.objects.all(), 'Mirrorless')), [self.camera])
@@ -1,25 +1,102 @@
 from django.test import TestCase
+from django.urls import reverse
 
+from market.models import (Item, Item_category, Item_in_cart, Item_in_order,
+                           Order, Review, Unauthorised_order)
+from market.tests.utils import PASSWORD, QueryBudgetMixin, create_profile
 from market.urls import urlpatterns
 
 PROJECT_URLS = [url.pattern.name for url in urlpatterns]
 
+# Route name: (who requests it, URL arguments, query budget)
+ROUTES = {
+    'main': ('guest', [], 2),
+    'sign_in': ('guest', [], 0),
+    'sign_out': ('user', [], 0),
+    'sign_up': ('guest', [], 0),
+    'password_reset_form': ('guest', [], 0),
+    'password_reset_done': ('guest', [], 0),
+    'password_reset_confirm': ('guest', ['MQ', 'set-password'], 1),
+    'password_reset_complete': ('guest', [], 0),
+    'catalogue': ('guest', [], 0),
+    'product': ('guest', ['item'], 3),
+    'product_reviews': ('guest', ['item'], 1),
+    'cart': ('user', [], 3),
+    'order': ('user', [], 7),
+    'payment': ('user', ['order'], 2),
+    'payment_status': ('user', ['order'], 2),
+    'confirmation': ('user', ['order'], 1),
+    'error': ('user', ['order'], 1),
+    'account': ('user', ['user'], 4),
+    'profile': ('user', ['user'], 3),
+    'history': ('user', ['profile', 'order'], 10),
+    'password_change': ('user', [], 1),
+    'password_change_done': ('user', [], 1),
+    'moderator': ('admin', [], 1),
+    'moderator_search': ('admin', [], 1),
+    'moderator_users': ('admin', [], 2),
+    'moderator_orders': ('admin', [], 3),
+    'moderator_categories': ('admin', [], 2),
+    'moderator_categories_create': ('admin', [], 1),
+    'moderator_products': ('admin', [], 3),
+    'moderator_products_create': ('admin', [], 2),
+    'moderator_users_edit': ('admin', ['profile'], 2),
+    'moderator_order_edit': ('admin', ['order'], 5),
+    'moderator_unauth_order_edit': ('admin', ['guest_order'], 2),
+    'moderator_product_edit': ('admin', ['item'], 5),
+    'moderator_categories_edit': ('admin', ['category'], 3),
+}
 
-class ViewTest(TestCase):
+
+class ViewTest(QueryBudgetMixin, TestCase):
 
     @classmethod
     def setUpTestData(cls):
-        pass
+        profile = create_profile()
+        cart = profile.cart
+        create_profile('moderator', tel='9007654321', cart=False, admin=True)
+        category = Item_category.objects.create(name='Phones')
+        items = [Item.objects.create(name=f'Phone {number}', category=category, price=100,
+                                     limited=True)
+                 for number in range(5)]
+        for item in items:
+            Item_in_cart.objects.create(cart=cart, item=item, quantity=1)
+            Review.objects.create(item=item, author=profile, description='Good')
+        order = Order.objects.create(profile=profile, tel='9001234567', price=500)
+        Item_in_order.objects.bulk_create([Item_in_order(order=order, item=item, quantity=1)
+                                           for item in items])
+        guest_order = Unauthorised_order.objects.create(session_key='42', tel='0')
+        cls.objects = {
+            'user': profile.user_id,
+            'profile': profile.id,
+            'item': items[0].id,
+            'order': order.id,
+            'guest_order': guest_order.id,
+            'category': category.id,
+        }
+
+    def route_url(self, name):
+        who, args, budget = ROUTES[name]
+        if who != 'guest':
+            self.client.login(username='moderator' if who == 'admin' else 'buyer',
+                              password=PASSWORD)
+        return reverse(name, args=[self.objects.get(arg, arg) for arg in args]), budget
 
+    def test_every_route_has_a_budget(self):
+        self.assertEqual(sorted(name for name in PROJECT_URLS if name), sorted(ROUTES))
 
     def test_templates_exist(self):
-        for url in PROJECT_URLS:
-            if url:
-                if 'detail' in url:
-                    arg_list = [item.id for item in Item.objects.all()]
-                    for arg in arg_list:
-                        response = self.client.get(reverse(url, args=[arg]))
-                        self.assertFalse(response.status_code == 404)
-                else:
-                    response = self.client.get(reverse(url))
-                    self.assertFalse(response.status_code == 404)
\ No newline at end of file
+        for name in ROUTES:
+            with self.subTest(route=name):
+                url, budget = self.route_url(name)
+                response = self.client.get(url)
+                self.assertFalse(response.status_code == 404)
+                self.client.logout()
+
+    def test_query_budgets(self):
+        for name in ROUTES:
+            with self.subTest(route=name):
+                url, budget = self.route_url(name)
+                self.client.get(url)
+                self.assertQueryBudget(url, budget)
+                self.client.logout()
@@ -0,0 +1,39 @@
+from django.contrib.auth.models import Group, User
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from market.models import Cart, Profile
+
+PASSWORD = 'pass_w_123'
+
+
+def create_groups():
+    """Groups that new profiles and moderators are added to"""
+    for name in ('Admins', 'Users'):
+        Group.objects.get_or_create(name=name)
+
+
+def create_profile(username='buyer', tel='9001234567', cart=True, **fields):
+    """User with a profile and, unless cart is False, an empty cart. Returns the profile"""
+    create_groups()
+    user = User.objects.create_user(username=username, password=PASSWORD)
+    profile = Profile.objects.create(user=user, tel=tel, **fields)
+    if cart:
+        Cart.objects.create(profile=profile)
+    return profile
+
+
+class QueryBudgetMixin:
+
+    """Assertions on the number of queries made by a request"""
+
+    def assertQueryBudget(self, url, budget, method='get', data=None):
+        with CaptureQueriesContext(connection) as queries:
+            response = getattr(self.client, method)(url, data)
+        executed = len(queries.captured_queries)
+        self.assertLessEqual(
+            executed, budget,
+            f'{url} made {executed} queries, the budget is {budget}:\n' +
+            '\n'.join(query['sql'] for query in queries.captured_queries)
+        )
+        return response
@@ -1,8 +1,7 @@
-from django.conf import settings
-from django.conf.urls.static import static
 from django.urls import include, path, re_path
 
 import market.views as views
+from market.assets import asset_patterns
 
 urlpatterns = [
     path('', views.MainPageView.as_view(), name='main'),
@@ -15,9 +14,11 @@ urlpatterns = [
     re_path(r'^reset/done/$', views.UserPasswordResetCompleteView.as_view(), name='password_reset_complete'),
     path('catalogue', views.ProductList.as_view(), name='catalogue'),
     path('catalogue/<int:pk>', views.ProductDetail.as_view(), name='product'),
+    path('catalogue/<int:pk>/reviews', views.ProductReviewsView.as_view(), name='product_reviews'),
     path('cart', views.CartView.as_view(), name='cart'),
     path('order', views.OrderView.as_view(), name='order'),
     path('order/<int:pk>/payment', views.PaymentView.as_view(), name='payment'),
+    path('order/<int:pk>/payment/status', views.PaymentStatusView.as_view(), name='payment_status'),
     path('order/<int:pk>/payment/confirmation', views.PaymentConfirmationView.as_view(), name='confirmation'),
     path('order/<int:pk>/payment/error', views.PaymentErrorView.as_view(), name='error'),
     path('account/<int:pk>', views.AccountDetailView.as_view(), name='account'),
@@ -26,6 +27,7 @@ urlpatterns = [
     path('password_change', views.PasswordUpdateView.as_view(), name='password_change'),
     path('password_change_done', views.PasswordUpdateDone.as_view(), name='password_change_done'),
     path('moderator', views.ModeratorsView.as_view(), name='moderator'),
+    path('moderator_search', views.ModeratorSearchView.as_view(), name='moderator_search'),
     path('moderator_users', views.UsersListView.as_view(), name='moderator_users'),
     path('moderator_orders', views.OrdersListView.as_view(), name='moderator_orders'),
     path('moderator_categories', views.CategoriesListView.as_view(), name='moderator_categories'),
@@ -38,4 +40,4 @@ urlpatterns = [
     path('moderator_products/<int:pk>', views.ProductUpdateView.as_view(), name='moderator_product_edit'),
     path('moderator_categories/<int:pk>', views.CategoriesDetailView.as_view(), name='moderator_categories_edit'),
     path('i18n/', include('django.conf.urls.i18n'))
-] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+] + asset_patterns()
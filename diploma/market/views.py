@@ -1,8 +1,7 @@
 import datetime
-import json
 import random
-import urllib
 
+from django.conf import settings
 from django.contrib.auth import authenticate, login
 from django.contrib.auth.forms import PasswordChangeForm
 from django.contrib.auth.views import (LoginView, LogoutView,
@@ -12,45 +11,86 @@ from django.contrib.auth.views import (LoginView, LogoutView,
                                        PasswordResetConfirmView,
                                        PasswordResetDoneView,
                                        PasswordResetView)
-from django.core import serializers
+from django.core.cache import cache
 from django.core.exceptions import PermissionDenied
 from django.db import transaction
-from django.db.models import Q
-from django.http import HttpResponseRedirect
-from django.shortcuts import render
+from django.http import HttpResponseRedirect, JsonResponse
+from django.shortcuts import get_object_or_404, render
+from django.template.loader import render_to_string
 from django.urls import reverse, reverse_lazy
-from django.utils.translation import gettext as _
+from django.utils.http import urlencode
+from django.utils.translation import get_language
 from django.views import View, generic
 
+from market.cache import get_active_categories, get_session_profile_id
+from market.carts import (add_item, change_quantity, get_cart_owner,
+                          guest_cart_total, remove_line)
+from market.catalogue import (catalogue_items, catalogue_page_key,
+                              filter_params, normalize_filters)
 from market.forms import (AvatarUploadForm, BuyForm, ImageAddForm,
                           Item_categoryForm, ModeratorOrderForm, OrderForm,
                           PaymentForm, ProductForm, ProfileForm,
                           ProfileUpdateForm, RegisterForm, ReviewCreateForm,
                           UnAuthOrderForm, UserUpdateForm)
-from market.helpers import (check_or_set_user_cookie_data,
-                            create_order_and_cart_data,
-                            delete_all_items_in_cart,
-                            get_or_create_items_for_user, get_sum_of_items,
-                            payment_imitation)
+from market.helpers import check_or_set_user_cookie_data
+from market.images import attach_primary_images, update_derivatives
 from market.models import (Cart, Item, Item_category, Item_image, Item_in_cart,
-                           Item_in_order, Item_in_unauthorised_order,
-                           Item_in_unauthorized_cart, Order, Profile, Review,
-                           Unauthorised_order, User)
+                           Item_in_order, Item_in_unauthorized_cart, Order,
+                           Profile, Review, Unauthorised_order, User)
+from market.orders import build_order, merge_guest_data
+from market.pagination import keyset_page
+from market.payments import (PAYMENT_FAILURE, enqueue_payment, fail_payment,
+                             payment_in_flight)
+from market.reviews import review_page, serialize_review
+from market.roles import is_admin
+from market.sales import get_best_sellers
+from market.search import MODERATOR_ENTITIES, moderator_search
 
 # Create your views here.
 
 class AdminRequiredMixin(object):
 
     def dispatch(self, request, *args, **kwargs):
-        if not request.user.is_authenticated:
+        if not is_admin(request):
             raise PermissionDenied
-        else:
-            user_groups = [group.name for group in request.user.groups.all()]
-            if 'Admins' not in user_groups:
-                raise PermissionDenied
         return super(AdminRequiredMixin, self).dispatch(request, *args, **kwargs)
 
 
+class KeysetPageMixin(object):
+
+    """Keyset pagination of a list view with a choice of sort order"""
+
+    sort_options = {}
+    default_sort = None
+
+    def get_page(self, queryset, prefix=''):
+        request = self.request
+        sort_type = request.GET.get(f'{prefix}sort')
+        if sort_type not in self.sort_options:
+            sort_type = self.default_sort
+        rows, next_cursor = keyset_page(queryset,
+                                        self.sort_options[sort_type],
+                                        request.GET.get(f'{prefix}after'),
+                                        settings.MODERATOR_PAGE_SIZE)
+        next_page = None
+        if next_cursor:
+            next_page = request.GET.copy()
+            next_page[f'{prefix}sort'] = sort_type
+            next_page[f'{prefix}after'] = next_cursor
+            next_page = next_page.urlencode()
+        return rows, {f'{prefix}sort_type': sort_type, f'{prefix}next_page': next_page}
+
+
+def get_customer_order(request, pk):
+    """
+    Order of the current user or of the current guest session, orders of
+    other customers are not found
+    """
+    if request.user.is_authenticated:
+        return get_object_or_404(Order, id=pk, profile_id=get_session_profile_id(request))
+    return get_object_or_404(Unauthorised_order, id=pk, session_key=check_or_set_user_cookie_data(request))
+
+
 class UserIsAuthenticatedMixin(object):
 
     def dispatch(self, request, *args, **kwargs):
@@ -68,9 +108,10 @@ class MainPageView(View):
     def get(self, request):
 
 
-        items = Item.objects.filter(limited=True)[:10]
+        items = attach_primary_images(Item.objects.filter(limited=True)[:10])
         context = {
-            'items': items
+            'items': items,
+            'best_sellers': get_best_sellers(),
         }
         return render(request, 'market/main.html', context=context)
 
@@ -79,88 +120,55 @@ class MainPageView(View):
 class ProductList(View):
 
     template_name = 'market/catalogue.html'
+    items_template_name = 'market/catalogue_items.html'
 
     """Creates a view of items in specific category with filtering
-    by price and by reviews options"""
+    by price and by reviews options, sorting and pagination. The list
+    of items is cached per category, filters and language"""
+    def get_category(self, request):
+        categories = get_active_categories()
+        name = request.GET.get('category_query') or categories['default']
+        if name in categories['ids']:
+            return Item_category(id=categories['ids'][name], name=name)
+        return get_object_or_404(Item_category, name=name)
+
+    def get_page(self, request, category, filters):
+        items, next_cursor, sort_type, ranked = catalogue_items(category.id, filters)
+        next_page = None
+        if next_cursor:
+            params = filter_params({**filters, 'sort': sort_type, 'after': next_cursor})
+            next_page = urlencode({'category_query': category.name, **params})
+        items_html = render_to_string(self.items_template_name,
+                                      {'items': attach_primary_images(items)})
+        return {'items_html': items_html,
+                'sort_type': sort_type,
+                'ranked': ranked,
+                'next_page': next_page}
+
     def get(self, request):
-        category_query = request.GET.get('category_query')
-        if not category_query:
-            category_query = Item_category.objects.filter(status=True)[0]
-        category = Item_category.objects.get(name=category_query)
-        max_price = request.GET.get('max_price')
-        min_price = request.GET.get('min_price')
-        if not max_price:
-            max_price = 999999999
-        if not min_price:
-            min_price = 0
-        reviews_check = request.GET.get('reviews_check')
-        item_query = request.GET.get('item_query')
-        if not item_query:
-            item_query = ''
-        if reviews_check:
-            items = Item.objects.filter(Q(name__icontains=item_query)|
-                                        Q(description__icontains=item_query),
-                                        category=category,
-                                        status=True,
-                                        price__lte=max_price,
-                                        price__gte=min_price,
-                                        has_reviews=True)
-        else:
-            items = Item.objects.filter(Q(name__icontains=item_query)|
-                                        Q(description__icontains=item_query),
-                                        category=category,
-                                        status=True,
-                                        price__lte=max_price,
-                                        price__gte=min_price)
-
-        serialized_items = serializers.serialize('json', items)
-        serialized_category = category.name
-        context = {'items': items,
+        category = self.get_category(request)
+        filters = normalize_filters(request.GET)
+        key = catalogue_page_key(category.id, filters, get_language())
+        page = cache.get(key)
+        if page is None:
+            page = self.get_page(request, category, filters)
+            cache.set(key, page, settings.CATALOGUE_CACHE_TIMEOUT)
+        form_filters = request.GET.copy()
+        for param in ('sort', 'after'):
+            form_filters.pop(param, None)
+        context = {**page,
                    'category': category,
-                   'serialized_items': serialized_items,
-                   'serialized_category': serialized_category}
+                   'best_sellers': get_best_sellers(category.id),
+                   'filters': form_filters.items()}
         return render(request, self.template_name, context=context)
 
     def post(self, request):
         """
-        Does filtering of products, allows to add item to a cart
+        Allows to add item to a cart and returns to the same page
         """
-
-        items = urllib.parse.unquote(request.POST.get('items_data'))
-        items = json.loads(items)
-        item_ids = [item['pk'] for item in items]
-        items = Item.objects.filter(id__in=item_ids)
-        sort_type = request.POST.get('sort_query')
-        if sort_type == 'Price':
-            items = items.order_by('price')
-        else:
-            items = items.order_by('name')
-        category = request.POST.get('category_data')
         if request.POST.get('add_to_cart'):
-            new_item_added = int(request.POST.get('item_added'))
-            new_item_added = Item.objects.get(id=new_item_added)
-            if request.user.is_authenticated:
-                profile = Profile.objects.get(user=request.user)
-                cart = Cart.objects.get(profile=profile)
-                item_added = Item_in_cart.objects.filter(item=new_item_added, cart=cart).exists()
-                if item_added:
-                    new_item_added = Item_in_cart.objects.get(item=new_item_added, cart=cart)
-                    new_item_added.quantity += 1
-                    new_item_added.save()
-                else:
-                    new_item_added = Item_in_cart.objects.create(item=new_item_added, cart=cart, quantity=1)
-                cart.cart_price += new_item_added.item.price
-                cart.save()
-            else:
-                get_or_create_items_for_user(request, new_item_added)
-        serialized_category = category
-        category = Item_category.objects.get(name=category)
-        serialized_items = serializers.serialize('json', items)
-        context = {'items': items,
-                   'category': category,
-                   'serialized_items': serialized_items,
-                   'serialized_category': serialized_category}
-        return render(request, self.template_name, context=context)
+            add_item(int(request.POST.get('item_added')), 1, **get_cart_owner(request))
+        return HttpResponseRedirect(request.get_full_path())
 
 
 
@@ -173,28 +181,16 @@ class ProductDetail(generic.DetailView):
     template_name = 'market/product.html'
     context_object_name = 'item'
 
-    def get_context_data(self, rev_num=3, **kwargs):
+    def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        item = self.get_object()
-        reviews = Review.objects.filter(item=item)
-        images = Item_image.objects.filter(item=item)
+        item = self.object
+        reviews, next_cursor = review_page(item.id)
         context['buy_form'] = BuyForm()
         context['review_form'] = ReviewCreateForm()
-        context['images'] = images
-        length = len(reviews)
-        if rev_num < length:
-            rev_add = True
-        else:
-            rev_add = False
-        context['rev_add'] = rev_add
-        context['rev_num'] = rev_num
-        if reviews.exists():
-            review_exists = True
-            context['reviews'] = reviews[0:rev_num]
-        else:
-            review_exists = False
-            context['reviews'] = _('There are no reviews yet')
-        context['reviews_exist'] = review_exists
+        context['images'] = Item_image.objects.filter(item=item)
+        context['reviews'] = reviews
+        context['next_reviews'] = next_cursor
+        context['reviews_exist'] = item.number_of_reviews > 0
         return context
 
     def post(self, request, pk):
@@ -206,39 +202,36 @@ class ProductDetail(generic.DetailView):
         review_form = ReviewCreateForm(request.POST)
         if review_form.is_valid():
             if user.is_authenticated:
-                profile = Profile.objects.get(user=user)
                 description = review_form.cleaned_data['description']
-                review = Review.objects.create(item=item, description=description, author=profile)
-                review.save()
+                Review.objects.create(item=item, description=description, author=request.profile)
                 return HttpResponseRedirect(f'/catalogue/{pk}')
             else:
                 raise PermissionDenied
         buy_form = BuyForm(request.POST)
         if buy_form.is_valid():
-            items_num = buy_form.cleaned_data['number']
-            price = item.price
-            if user.is_authenticated:
-                profile = Profile.objects.get(user=user)
-                cart = Cart.objects.get(profile=profile)
-                if Item_in_cart.objects.filter(item=item, cart=cart).exists():
-                    item_in_cart = Item_in_cart.objects.get(cart=cart, item=item)
-                else:
-                    item_in_cart = Item_in_cart.objects.create(cart=cart, item=item)
-                item_in_cart.quantity += items_num - 1
-                cart.cart_price += price * float(items_num)
-                item_in_cart.save()
-                cart.save()
-                return HttpResponseRedirect(f'/catalogue/{pk}')
-            else:
-                get_or_create_items_for_user(request, item, items_num)
-                return HttpResponseRedirect(f'/catalogue/{pk}')
-        rev_new = request.POST['number_of_reviews']
-        if rev_new:
-            rev_new += 3
-            self.object = self.get_object()
-            context = self.get_context_data(rev_num=rev_new)
-            return render(request, self.template_name, context=context)
-        return HttpResponseRedirect(f'/catalogue')
+            items_num = int(buy_form.cleaned_data['number'])
+            add_item(item.id, items_num, **get_cart_owner(request))
+        return HttpResponseRedirect(f'/catalogue/{pk}')
+
+
+class ProductReviewsView(View):
+
+    """Next page of the reviews of a product, as an HTML fragment or JSON"""
+
+    template = 'market/reviews_page.html'
+
+    def get(self, request, pk):
+        reviews, next_cursor = review_page(pk, request.GET.get('after'))
+        if request.GET.get('format') == 'json':
+            return JsonResponse({
+                'reviews': [serialize_review(review) for review in reviews],
+                'next': next_cursor,
+            })
+        return render(request, self.template, context={
+            'item_id': pk,
+            'reviews': reviews,
+            'next_reviews': next_cursor,
+        })
 
 
 class CartView(View):
@@ -250,20 +243,15 @@ class CartView(View):
     def get(self, request):
         user = request.user
         if user.is_authenticated:
-            profile = Profile.objects.get(user=user)
-            cart = Cart.objects.get(profile=profile)
-            check_cart_full = False
-            if Item_in_cart.objects.filter(cart=cart).exists():
-                check_cart_full = True
-            items_in_cart = Item_in_cart.objects.filter(cart=cart)
+            cart = request.cart
+            items_in_cart = Item_in_cart.objects.filter(cart_id=cart.id)
             price = cart.cart_price
         else:
-            check_cart_full = False
             session_key = check_or_set_user_cookie_data(request)
-            if Item_in_unauthorized_cart.objects.filter(session_key=session_key).exists():
-                check_cart_full = True
             items_in_cart = Item_in_unauthorized_cart.objects.filter(session_key=session_key)
-            price = get_sum_of_items(session_key)
+            price = guest_cart_total(session_key)
+        items_in_cart = list(items_in_cart.select_related('item'))
+        check_cart_full = bool(items_in_cart)
         return render(request, self.template, context={
             'items_in_cart': items_in_cart,
             'price': price,
@@ -275,35 +263,14 @@ class CartView(View):
         """
         Delete a product or change a quantity of products
         """
-        user = request.user
         pk = request.POST['id']
-        if user.is_authenticated:
-            item = Item_in_cart.objects.get(id=pk)
-            profile = Profile.objects.get(user=user)
-            cart = Cart.objects.get(profile=profile)
-        else:
-            item = Item_in_unauthorized_cart.objects.get(id=pk)
+        owner = get_cart_owner(request)
         if request.POST.get('delete'):
-            item.delete()
+            remove_line(pk, **owner)
         elif request.POST.get('add_more'):
-            add = int(request.POST['add_more'])
-            item.quantity += add
-            item.save()
-            price = item.quantity * item.item.price
-            if user.is_authenticated:
-                cart.cart_price += price
-                cart.save()
+            change_quantity(pk, int(request.POST['add_more']), **owner)
         elif request.POST.get('del_more'):
-            reduce = int(request.POST['del_more'])
-            if item.quantity - reduce <= 0:
-                item.delete()
-            else:
-                item.quantity -= reduce
-                item.save()
-                price = item.quantity * item.item.price
-                if user.is_authenticated:
-                    cart.cart_price -= price
-                    cart.save()
+            change_quantity(pk, -int(request.POST['del_more']), **owner)
         return HttpResponseRedirect('/cart')
 
 class OrderView(View):
@@ -315,40 +282,18 @@ class OrderView(View):
     def get(self, request):
         user = request.user
         if user.is_authenticated:
-            profile = Profile.objects.get(user=user)
-            cart = Cart.objects.get(profile=profile)
-            if not Item_in_cart.objects.filter(cart=cart).exists():
-                raise PermissionDenied
-            items = Item_in_cart.objects.filter(cart=cart)
-            order = Order.objects.create(profile=profile, tel=profile.tel)
-            for item in items:
-                Item_in_order.objects.create(item=item.item,
-                                             order=order,
-                                             quantity=item.quantity,
-                                             price_of_item=item.item.price)
-            items_in_order = Item_in_order.objects.filter(order=order)
-            order.tel = profile.tel
-            order.name = profile.user.username
-            order.save()
+            profile = request.profile
+            order, items_in_order = build_order(profile=profile)
+            if order is not None:
+                order.name = profile.user.username
         else:
             profile = None
             session_key = check_or_set_user_cookie_data(request)
-            if not Item_in_unauthorized_cart.objects.filter(session_key=session_key):
-                raise PermissionDenied
-            items = Item_in_unauthorized_cart.objects.filter(session_key=session_key)
-            order = Unauthorised_order.objects.create(session_key=session_key, tel='0')
-            for item in items:
-                Item_in_unauthorised_order.objects.create(item=item.item,
-                                                          order=order,
-                                                          quantity=item.quantity,
-                                                          price_of_item=item.item.price)
-            items_in_order = Item_in_unauthorised_order.objects.filter(order=order)
+            order, items_in_order = build_order(session_key=session_key)
+        if order is None:
+            raise PermissionDenied
         order_form = OrderForm()
-        price = 0
-        for item in items_in_order:
-            price += item.price_of_item
-        order.price = price
-        order.save()
+        price = order.price
         context = {
             'items_in_order': items_in_order,
             'order_form': order_form,
@@ -368,21 +313,15 @@ class OrderView(View):
             payment_method = request.POST['payment_method']
             delivery_method = request.POST['delivery_method']
             address = request.POST['address']
-            order_id = request.POST['order_id']
-            if user.is_authenticated:
-                order = Order.objects.get(id=order_id)
-                kwarg = order_id
-            else:
-                session_key = check_or_set_user_cookie_data(request)
-                order = Unauthorised_order.objects.get(session_key=session_key)
+            order = get_customer_order(request, request.POST['order_id'])
+            if not user.is_authenticated:
                 order.name = request.POST['enter_name']
-                kwarg = session_key
             order.tel = tel
             order.delivery_method = delivery_method
             order.payment_method = payment_method
             order.adress = address
             order.save()
-            url = reverse('payment', kwargs={'pk': kwarg})
+            url = reverse('payment', kwargs={'pk': order.id})
             return HttpResponseRedirect(url)
         return HttpResponseRedirect('order')
 
@@ -393,10 +332,7 @@ class PaymentView(View):
     template = 'market/payment.html'
 
     def get(self, request, pk):
-        if request.user.is_authenticated:
-            order = Order.objects.get(id=pk)
-        else:
-            order = Unauthorised_order.objects.get(session_key=pk)
+        order = get_customer_order(request, pk)
         payment_method = order.payment_method
         delivery_method = order.delivery_method
         random_button = False
@@ -421,10 +357,7 @@ class PaymentView(View):
     @transaction.atomic()
     def post(self, request, pk):
         """immitation of payment"""
-        if request.user.is_authenticated:
-            order = Order.objects.get(id=pk)
-        else:
-            order = Unauthorised_order.objects.get(session_key=pk)
+        order = get_customer_order(request, pk)
         payment_method = order.payment_method
         confirm = False
         if payment_method == 'card':
@@ -436,19 +369,34 @@ class PaymentView(View):
             confirm = True
             card_num = request.POST['random_num']
         if confirm:
-            url1 = reverse('confirmation', kwargs={'pk': pk})
-            url2 = reverse('error', kwargs={'pk': pk})
-            imit = payment_imitation(card_num)
-            if imit:
-                order.payment_status = True
-                order.error = None
-                order.save()
-                delete_all_items_in_cart(request)
-                return HttpResponseRedirect(url1)
-            else:
-                order.error = 'Payment is failed. Incorrect account data'
-                order.save()
-                return HttpResponseRedirect(url2)
+            if order.payment_status:
+                return HttpResponseRedirect(reverse('confirmation', kwargs={'pk': pk}))
+            if not payment_in_flight(order):
+                enqueue_payment(order, card_num)
+            return HttpResponseRedirect(reverse('payment_status', kwargs={'pk': pk}))
+
+
+class PaymentStatusView(View):
+
+    """Page polled by the client while the payment is being settled"""
+
+    template = 'market/payment_status.html'
+
+    def get(self, request, pk):
+        order = get_customer_order(request, pk)
+        if order.payment_status:
+            return HttpResponseRedirect(reverse('confirmation', kwargs={'pk': pk}))
+        if order.payment_pending and not payment_in_flight(order):
+            fail_payment(type(order), order.id)
+            order.payment_pending, order.error = False, PAYMENT_FAILURE
+        if not order.payment_pending and order.error:
+            return HttpResponseRedirect(reverse('error', kwargs={'pk': pk}))
+        context = {
+            'order': order,
+            'param': pk
+        }
+        return render(request, self.template, context=context)
+
 
 class PaymentConfirmationView(View):
 
@@ -475,8 +423,11 @@ class AccountDetailView(UserIsAuthenticatedMixin, generic.DetailView):
 
     def get_context_data(self, **kwargs):
         context = super(AccountDetailView, self).get_context_data()
-        user = self.get_object()
-        profile = Profile.objects.get(user=user)
+        user = self.object
+        if user.id == self.request.user.id:
+            profile = self.request.profile
+        else:
+            profile = Profile.objects.get(user=user)
         orders = Order.objects.filter(profile=profile).order_by('date_of_order')
         context['profile'] = profile
         context['orders'] = orders
@@ -496,10 +447,15 @@ class AccountUpdateView(UserIsAuthenticatedMixin, generic.UpdateView):
     def get(self, request, *args, **kwargs):
 
         return super().get(request, *args, **kwargs)
+
+    def get_profile(self, user):
+        if user.id == self.request.user.id:
+            return self.request.profile
+        return Profile.objects.get(user=user)
+
     def get_context_data(self, **kwargs):
         context = super(AccountUpdateView, self).get_context_data()
-        user = self.get_object()
-        profile = Profile.objects.get(user=user)
+        profile = self.get_profile(self.object)
         profile_form = ProfileUpdateForm()
         context['profile'] = profile
         context['avatar_form'] = AvatarUploadForm()
@@ -507,12 +463,12 @@ class AccountUpdateView(UserIsAuthenticatedMixin, generic.UpdateView):
         return context
 
     def post(self, request, *args, **kwargs):
-        user = self.get_object()
-        profile = Profile.objects.get(user=user)
+        profile = self.get_profile(self.get_object())
         avatar_form = AvatarUploadForm(request.POST)
         if avatar_form.is_valid():
             profile.avatar = request.FILES.get('image')
             profile.save()
+            update_derivatives(profile)
         profile_form = ProfileUpdateForm(request.POST)
         if profile_form.is_valid():
             profile.tel = profile_form.cleaned_data['tel']
@@ -588,7 +544,7 @@ class RegisterView(View):
             login(request, user)
             cart = Cart.objects.create(profile=profile)
             session_key = check_or_set_user_cookie_data(request)
-            create_order_and_cart_data(session_key, cart, profile)
+            merge_guest_data(session_key, cart, profile)
             return HttpResponseRedirect('/')
         return render(request, self.template, context={'form': form})
 
@@ -617,61 +573,57 @@ class ModeratorsView(AdminRequiredMixin, View):
         return render(request, self.template_name)
 
 
-class UsersListView(AdminRequiredMixin, generic.ListView):
+class UsersListView(AdminRequiredMixin, KeysetPageMixin, View):
 
     template_name = 'market/moderator_users.html'
-    model = Profile
+    sort_options = {
+        'username': ('user__username', 'id'),
+        'id': ('id',),
+    }
+    default_sort = 'username'
 
-    def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
-        context['profiles'] = Profile.objects.all()
-        return context
+    def get(self, request):
+        profiles = Profile.objects.select_related('user').only('id', 'user__username')
+        profiles, context = self.get_page(profiles)
+        context['profiles'] = profiles
+        return render(request, self.template_name, context)
 
-    def post(self, request):
-        search = request.POST.get('searcher')
-        if search or search == '':
-            users = User.objects.filter(username__icontains=search)
-            ids = [user.id for user in users]
-            profiles = Profile.objects.filter(user__in=ids)
-            return render(request, self.template_name, context={'profiles': profiles})
-
-class OrdersListView(AdminRequiredMixin, generic.ListView):
-    template_name = 'market/moderator_orders.html'
-    model = Order
-    context_object_name = 'orders'
 
+class OrdersListView(AdminRequiredMixin, KeysetPageMixin, View):
+    template_name = 'market/moderator_orders.html'
+    sort_options = {
+        'date': ('-date_of_order', '-id'),
+        'price': ('-price', '-id'),
+        'id': ('-id',),
+    }
+    default_sort = 'date'
 
-    def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
-        context['unauth_orders'] = Unauthorised_order.objects.all()
-        return context
+    def get(self, request):
+        orders = Order.objects.select_related('profile__user') \
+                              .only('id', 'date_of_order', 'price', 'profile__user__username')
+        unauth_orders = Unauthorised_order.objects.only('id', 'session_key', 'name',
+                                                        'date_of_order', 'price')
+        orders, context = self.get_page(orders)
+        unauth_orders, guest_context = self.get_page(unauth_orders, prefix='guest_')
+        context.update(guest_context, orders=orders, unauth_orders=unauth_orders)
+        return render(request, self.template_name, context)
 
 
-    def post(self, request):
-        search = request.POST.get('searcher')
-        if search or search == '':
-            users = User.objects.filter(username__icontains=search)
-            tels = Profile.objects.filter(tel__icontains=search)
-            ids = [user.id for user in users]
-            profiles = Profile.objects.filter(user__in=ids)
-            orders = Order.objects.filter(profile__in=profiles)
-            unauth_orders = Unauthorised_order.objects.filter(tel__in=tels)
-            return render(request, self.template_name, context={'orders': orders, 'unauth_orders': unauth_orders})
-
-class ProductsListView(AdminRequiredMixin, generic.ListView):
+class ProductsListView(AdminRequiredMixin, KeysetPageMixin, View):
     template_name = 'market/moderator_products.html'
-    model = Item
+    sort_options = {
+        'name': ('name', 'id'),
+        'price': ('price', 'id'),
+        'id': ('id',),
+    }
+    default_sort = 'name'
 
-    def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
-        context['items'] = Item.objects.filter(status=True)
-        return context
+    def get(self, request):
+        items, context = self.get_page(Item.objects.filter(status=True).only('id', 'name', 'price'))
+        context['items'] = attach_primary_images(items)
+        return render(request, self.template_name, context)
 
     def post(self, request):
-        search = request.POST.get('searcher')
-        if search or search == '':
-            items = Item_category.objects.filter(name__icontains=search, status=True)
-            return render(request, self.template_name, context={'items': items})
         pk = request.POST['id']
         item = Item.objects.get(id=pk)
         if request.POST.get('Delete'):
@@ -680,24 +632,27 @@ class ProductsListView(AdminRequiredMixin, generic.ListView):
         return HttpResponseRedirect('/moderator_products')
 
 
-class CategoriesListView(AdminRequiredMixin, generic.View):
+class CategoriesListView(AdminRequiredMixin, KeysetPageMixin, generic.View):
 
     template_name = 'market/moderator_categories.html'
-    #model = Item_category
+    sort_options = {
+        'name': ('name', 'id'),
+        'id': ('id',),
+    }
+    default_sort = 'name'
 
     def get(self, request):
-        categories = Item_category.objects.filter(status=True).all()
-        context = {
-            'categories' : categories,
-        }
+        categories = Item_category.objects.filter(status=True).only('id', 'name')
+        query = request.GET.get('q', '').strip()
+        if query:
+            categories = categories.filter(name__icontains=query)
+        categories, context = self.get_page(categories)
+        context['categories'] = categories
+        context['query'] = query
         return render(request, self.template_name, context)
 
     def post(self, request):
         """ Change a category or add a new one"""
-        search = request.POST.get('searcher')
-        if search or search == '':
-            category = Item_category.objects.filter(name__icontains=search, status=True)
-            return render(request, self.template_name, context={'categories': category})
         pk = request.POST['id']
         category = Item_category.objects.get(id=pk)
         new_name = request.POST['name']
@@ -712,6 +667,32 @@ class CategoriesListView(AdminRequiredMixin, generic.View):
 
 
 
+class ModeratorSearchView(AdminRequiredMixin, View):
+
+    """Users, orders, guest orders and products matching one search query"""
+
+    template_name = 'market/moderator_search.html'
+
+    def get(self, request):
+        query = request.GET.get('q', '')
+        category = request.GET.get('category')
+        category_id = int(category) if category and category.isdigit() else None
+        entities = ('products',) if category_id is not None else MODERATOR_ENTITIES
+        cursors = {entity: request.GET.get(f'{entity}_after') for entity in entities}
+        results = moderator_search(query, cursors, settings.MODERATOR_PAGE_SIZE,
+                                   entities, category_id)
+        context = {'query': query, 'category': category_id}
+        for entity, (rows, next_cursor) in results.items():
+            next_page = None
+            if next_cursor:
+                next_page = request.GET.copy()
+                next_page[f'{entity}_after'] = next_cursor
+                next_page = next_page.urlencode()
+            context[entity] = rows
+            context[f'{entity}_next_page'] = next_page
+        return render(request, self.template_name, context)
+
+
 class UsersUpdateView(AdminRequiredMixin, generic.UpdateView):
     model = Profile
     form_class = ProfileForm
@@ -757,7 +738,7 @@ class ProductUpdateView(AdminRequiredMixin, generic.UpdateView):
         if image_form.is_valid():
             images = request.FILES.getlist('image')
             for ims in images:
-                Item_image.objects.create(item=item, image=ims)
+                update_derivatives(Item_image.objects.create(item=item, image=ims))
             return HttpResponseRedirect('/moderator_products')
         return HttpResponseRedirect('/moderator_products_edit.html')
 
@@ -769,15 +750,11 @@ class CategoriesDetailView(AdminRequiredMixin, generic.DetailView):
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['items'] = Item.objects.filter(category=self.get_object(), status=True)
+        context['items'] = Item.objects.filter(category=self.object, status=True)
         return context
 
 
     def post(self, request, pk):
-        search = request.POST.get('searcher')
-        if search or search == '':
-            item = Item.objects.filter(name__icontains=search, status=True, category=self.get_object())
-            return render(request, self.template_name, context={'items': item})
         item = Item.objects.get(id=pk)
         if request.POST.get('Delete'):
             item.category = None